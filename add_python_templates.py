@@ -31,7 +31,7 @@ FILES_TO_PROCESS = [
 
 # Template generators for common patterns
 def generate_booking_platform_template():
-    return `from datetime import datetime
+    return '''from datetime import datetime
 from typing import List, Dict
 
 # In-memory storage (naive implementation)
@@ -76,10 +76,134 @@ def process_payment(payment_id: str, booking_id: str, amount: float) -> Dict:
         'created_at': datetime.now()
     }
     return payments[payment_id]
-`
+'''
+
+def generate_booking_platform_template_optimized():
+    return '''import threading
+from bisect import bisect_left
+from datetime import datetime
+from typing import List, Dict, Optional
+
+# In-memory storage
+users = {}
+listings = {}
+bookings = {}
+payments = {}
+
+# location -> {listing_id: None}, and listing_id -> the location it is indexed under
+_listings_by_location = {}
+_listing_locations = {}
+# listing_id -> booked check-in dates, sorted, and the matching (check_out, booking_id)
+# Booked ranges never overlap, so the check-outs are sorted too.
+_booked_starts = {}
+_booked_ranges = {}
+# Overlap check and insert are one step, so concurrent bookings cannot both succeed
+_booking_lock = threading.Lock()
+
+def _index_listing(listing_id: str, location: str) -> None:
+    _listing_locations[listing_id] = location
+    _listings_by_location.setdefault(location, {})[listing_id] = None
+
+def _unindex_listing(listing_id: str) -> None:
+    location = _listing_locations.pop(listing_id)
+    listing_ids = _listings_by_location[location]
+    del listing_ids[listing_id]
+    if not listing_ids:
+        del _listings_by_location[location]
+
+def _sync_listing_index() -> None:
+    """Index listings that were stored without going through create_listing."""
+    if len(_listing_locations) == len(listings):
+        return
+    for listing_id in [listing_id for listing_id in _listing_locations if listing_id not in listings]:
+        _unindex_listing(listing_id)
+    for listing_id, listing in listings.items():
+        if listing_id not in _listing_locations:
+            _index_listing(listing_id, listing.get('location'))
+
+def _is_available(listing_id: str, check_in: str, check_out: str) -> bool:
+    """
+    Whether [check_in, check_out) overlaps no booking of the listing, O(log n)
+    Dates are ISO strings ('2025-01-31'), which sort chronologically.
+    """
+    starts = _booked_starts.get(listing_id)
+    if not starts:
+        return True
+    # The last booking starting before check_out is the only one that can overlap
+    index = bisect_left(starts, check_out) - 1
+    return index < 0 or _booked_ranges[listing_id][index][0] <= check_in
+
+def create_listing(listing_id: str, host_id: str, location: str, price: float, **kwargs) -> Dict:
+    """
+    Create a listing
+    Optimized implementation - stores the listing and indexes it by location
+    """
+    if listing_id in _listing_locations:
+        _unindex_listing(listing_id)
+    listings[listing_id] = {
+        'id': listing_id,
+        'host_id': host_id,
+        'location': location,
+        'price': price,
+        'created_at': datetime.now(),
+        **kwargs
+    }
+    _index_listing(listing_id, location)
+    return listings[listing_id]
+
+def search_listings(location: str, check_in: str, check_out: str) -> List[Dict]:
+    """
+    Search for available listings
+    Optimized implementation - listings of the location free for the whole stay
+    Only the location's listings are checked, each in O(log n) bookings.
+    """
+    _sync_listing_index()
+    return [listings[listing_id] for listing_id in _listings_by_location.get(location, {})
+            if _is_available(listing_id, check_in, check_out)]
+
+def create_booking(booking_id: str, listing_id: str, user_id: str, check_in: str, check_out: str) -> Optional[Dict]:
+    """
+    Create a booking
+    Optimized implementation - books the stay only if no existing booking overlaps it
+    Returns None for an empty stay or when the dates are already taken.
+    """
+    if check_in >= check_out:
+        return None
+    with _booking_lock:
+        if not _is_available(listing_id, check_in, check_out):
+            return None
+        starts = _booked_starts.setdefault(listing_id, [])
+        index = bisect_left(starts, check_in)
+        starts.insert(index, check_in)
+        _booked_ranges.setdefault(listing_id, []).insert(index, (check_out, booking_id))
+        bookings[booking_id] = {
+            'id': booking_id,
+            'listing_id': listing_id,
+            'user_id': user_id,
+            'check_in': check_in,
+            'check_out': check_out,
+            'status': 'confirmed',
+            'created_at': datetime.now()
+        }
+    return bookings[booking_id]
+
+def process_payment(payment_id: str, booking_id: str, amount: float) -> Dict:
+    """
+    Process payment
+    Naive implementation - stores payment record
+    """
+    payments[payment_id] = {
+        'id': payment_id,
+        'booking_id': booking_id,
+        'amount': amount,
+        'status': 'completed',
+        'created_at': datetime.now()
+    }
+    return payments[payment_id]
+'''
 
 def generate_messenger_template():
-    return `from datetime import datetime
+    return '''from datetime import datetime
 from typing import List, Dict
 
 # In-memory storage (naive implementation)
@@ -113,7 +237,96 @@ def get_conversation(user1_id: str, user2_id: str) -> List[Dict]:
             conversation.append(msg)
     conversation.sort(key=lambda x: x['created_at'])
     return conversation
-`
+'''
+
+def generate_messenger_template_optimized():
+    return '''import itertools
+from bisect import bisect_left
+from datetime import datetime
+from typing import List, Dict, Optional, Tuple
+
+# In-memory storage
+users = {}
+# (user_a, user_b) -> conversation, with its messages as (sequence, message_id) oldest first
+conversations = {}
+messages = {}
+
+# Strictly increasing, so appending keeps every conversation time-ordered
+_message_sequence = itertools.count(1)
+# user_id -> {conversation_id: None}, least recently active first
+_inboxes = {}
+
+def conversation_id(user1_id: str, user2_id: str) -> Tuple[str, str]:
+    """
+    Normalized conversation id: the same for both directions
+    """
+    return (user1_id, user2_id) if user1_id <= user2_id else (user2_id, user1_id)
+
+def send_message(message_id: str, sender_id: str, recipient_id: str, content: str) -> Dict:
+    """
+    Send a message
+    Optimized implementation - appends to the conversation and moves it to the top of both inboxes
+    """
+    key = conversation_id(sender_id, recipient_id)
+    conversation = conversations.get(key)
+    if conversation is None:
+        conversation = conversations[key] = {
+            'id': key,
+            'participants': list(key),
+            'entries': [],
+            'created_at': datetime.now()
+        }
+    sequence = next(_message_sequence)
+    messages[message_id] = {
+        'id': message_id,
+        'conversation_id': key,
+        'sequence': sequence,
+        'sender_id': sender_id,
+        'recipient_id': recipient_id,
+        'content': content,
+        'created_at': datetime.now()
+    }
+    conversation['entries'].append((sequence, message_id))
+    conversation['last_message_id'] = message_id
+    conversation['updated_at'] = messages[message_id]['created_at']
+    for user_id in key:
+        inbox = _inboxes.setdefault(user_id, {})
+        inbox.pop(key, None)
+        inbox[key] = None
+    return messages[message_id]
+
+def get_conversation(user1_id: str, user2_id: str, limit: int = 50,
+                     before: Optional[int] = None) -> List[Dict]:
+    """
+    Get conversation between two users
+    Optimized implementation - one page of the conversation, oldest first
+    Returns the newest `limit` messages older than the `before` cursor. Pass
+    the first returned message's 'sequence' as `before` to fetch the page
+    preceding it. O(log n + limit), however long the conversation is.
+    """
+    conversation = conversations.get(conversation_id(user1_id, user2_id))
+    if conversation is None:
+        return []
+    entries = conversation['entries']
+    end = len(entries) if before is None else bisect_left(entries, (before,))
+    return [messages[message_id] for _, message_id in entries[max(0, end - limit):end]]
+
+def get_inbox(user_id: str, limit: int = 20) -> List[Dict]:
+    """
+    Get a user's conversations, most recently active first
+    Optimized implementation - reads the per-user recency index, O(limit)
+    """
+    inbox = []
+    for key in itertools.islice(reversed(_inboxes.get(user_id, {})), limit):
+        conversation = conversations[key]
+        inbox.append({
+            'id': key,
+            'participants': conversation['participants'],
+            'last_message': messages[conversation['last_message_id']],
+            'updated_at': conversation['updated_at']
+        })
+    return inbox
+'''
 
 def extract_frs(content):
     """Extract userFacingFRs from file content."""
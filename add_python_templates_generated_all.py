@@ -5,102 +5,30 @@ This script reads each file, finds all problem definitions, extracts their userF
 and generates a naive Python implementation for each one.
 """
 
+import argparse
+import asyncio
 import re
 import os
-from typing import List, Dict, Tuple
-import anthropic
+from typing import List, Dict
+
+from async_generation import GenerationEngine, GenerationSettings
+from template_cache import DEFAULT_CACHE_PATH, DEFAULT_MAX_BYTES, TemplateCache, template_cache_key
+from template_assets import ASSET_LAYOUTS, TemplateAssetStage
+from template_pipeline import Pipeline, PipelineFile, Stage, definition_files
 
 # Directory containing the problem definition files
 DEFINITIONS_DIR = "/Users/ankurkothari/Documents/workspace/idlecampus/frontend/src/apps/system-design/builder/challenges/definitions/generated-all"
 
-# Anthropic API client
-client = anthropic.Anthropic()
-
-def find_all_problem_definitions(content: str) -> List[Tuple[str, int, int]]:
-    """
-    Find all problem definitions in a file.
-    Returns list of (problem_name, start_pos, end_pos) tuples.
-    """
-    problems = []
-    # Match: export const xxxProblemDefinition: ProblemDefinition = {
-    pattern = r'export const (\w+ProblemDefinition): ProblemDefinition = \{'
-
-    for match in re.finditer(pattern, content):
-        problem_name = match.group(1)
-        start_pos = match.start()
-
-        # Find the closing brace for this definition
-        # We need to count braces to find the matching closing brace
-        brace_count = 0
-        pos = match.end() - 1  # Start at the opening brace
-        in_backtick = False
-        in_string = False
-        escape_next = False
-
-        while pos < len(content):
-            char = content[pos]
-
-            # Handle escape sequences
-            if escape_next:
-                escape_next = False
-                pos += 1
-                continue
-
-            if char == '\\':
-                escape_next = True
-                pos += 1
-                continue
-
-            # Handle backtick strings (template literals)
-            if char == '`':
-                in_backtick = not in_backtick
-                pos += 1
-                continue
-
-            # Handle regular strings
-            if char == '"' or char == "'":
-                if not in_backtick:
-                    in_string = not in_string
-                pos += 1
-                continue
-
-            # Only count braces outside of strings
-            if not in_backtick and not in_string:
-                if char == '{':
-                    brace_count += 1
-                elif char == '}':
-                    brace_count -= 1
-                    if brace_count == 0:
-                        # Found the closing brace
-                        # Now look for the semicolon
-                        semicolon_pos = content.find(';', pos)
-                        if semicolon_pos != -1:
-                            end_pos = semicolon_pos + 1
-                            problems.append((problem_name, start_pos, end_pos))
-                            break
-
-            pos += 1
-
-    return problems
-
-def extract_frs_from_definition(definition_content: str) -> List[str]:
-    """Extract userFacingFRs from a problem definition."""
-    # Find userFacingFRs array
-    match = re.search(r'userFacingFRs:\s*\[(.*?)\]', definition_content, re.DOTALL)
-    if match:
-        frs_text = match.group(1)
-        # Extract individual FRs (handle both single and double quotes)
-        frs = re.findall(r"['\"]([^'\"]*)['\"]", frs_text)
-        return [fr for fr in frs if fr.strip()]
-    return []
+# Bump whenever build_prompt changes so cached templates are regenerated
+PROMPT_VERSION = "1"
 
 def has_python_template(definition_content: str) -> bool:
     """Check if a problem definition already has pythonTemplate."""
     return 'pythonTemplate:' in definition_content or 'pythonTemplate :' in definition_content
 
-def generate_python_template_with_claude(problem_name: str, problem_title: str, frs: List[str]) -> str:
+def build_prompt(problem_title: str, frs: List[str]) -> str:
     """
-    Use Claude API to generate a naive Python implementation based on FRs.
+    Build the Claude prompt asking for a naive Python implementation based on FRs.
     """
     fr_list = "\n".join([f"{i+1}. {fr}" for i, fr in enumerate(frs)])
 
@@ -140,18 +68,10 @@ def function_name(params) -> return_type:
     pass
 ```"""
 
-    message = client.messages.create(
-        model="claude-sonnet-4-5-20250929",
-        max_tokens=2000,
-        messages=[{
-            "role": "user",
-            "content": prompt
-        }]
-    )
-
-    # Extract code from response
-    response_text = message.content[0].text
+    return prompt
 
+def extract_code(response_text: str) -> str:
+    """Strip the markdown fences from a generated template."""
     # Remove markdown code fences if present
     code = response_text.strip()
     if code.startswith('```python'):
@@ -163,13 +83,6 @@ def function_name(params) -> return_type:
 
     return code
 
-def extract_problem_title(definition_content: str) -> str:
-    """Extract the title from a problem definition."""
-    match = re.search(r"title:\s*['\"]([^'\"]*)['\"]", definition_content)
-    if match:
-        return match.group(1)
-    return "Unknown Problem"
-
 def add_python_template_to_definition(definition_content: str, python_code: str) -> str:
     """
     Add pythonTemplate to a problem definition.
@@ -199,130 +112,229 @@ def add_python_template_to_definition(definition_content: str, python_code: str)
 
     return definition_content
 
-def process_file(filepath: str) -> Dict[str, any]:
+class LLMTemplateStage(Stage):
     """
-    Process a single file, adding Python templates to all problem definitions.
-    Returns statistics about the processing.
+    Pipeline stage adding Claude-generated pythonTemplates. Templates are
+    looked up in `cache` first; a file's misses are generated concurrently
+    by one engine shared across files (connection pool and rate limits),
+    or reported as failures with `cache_only`. `refresh` skips cache
+    lookups but still stores the new results.
     """
-    filename = os.path.basename(filepath)
-    print(f"\n{'='*60}")
-    print(f"Processing: {filename}")
-    print(f"{'='*60}")
-
-    with open(filepath, 'r') as f:
-        content = f.read()
-
-    # Find all problem definitions
-    problems = find_all_problem_definitions(content)
-    print(f"Found {len(problems)} problem definitions")
-
-    stats = {
-        'filename': filename,
-        'total_problems': len(problems),
-        'already_had_template': 0,
-        'added_template': 0,
-        'failed': 0
-    }
-
-    # Process each problem definition in reverse order (so positions don't shift)
-    problems.reverse()
-
-    for problem_name, start_pos, end_pos in problems:
-        definition_content = content[start_pos:end_pos]
-
-        # Check if already has template
-        if has_python_template(definition_content):
-            print(f"  ✓ {problem_name}: Already has template")
-            stats['already_had_template'] += 1
-            continue
-
-        # Extract FRs
-        frs = extract_frs_from_definition(definition_content)
-        if not frs:
-            print(f"  ✗ {problem_name}: No FRs found")
-            stats['failed'] += 1
-            continue
-
-        # Extract title
-        title = extract_problem_title(definition_content)
-
-        print(f"  → {problem_name}: Generating template for {len(frs)} FRs...")
-
+    name = 'generate'
+    # The engine and its event loop live in the main process
+    parallel_safe = False
+
+    def __init__(self, settings: GenerationSettings, cache: TemplateCache,
+                 cache_only: bool = False, refresh: bool = False):
+        self.settings = settings
+        self.cache = cache
+        self.cache_only = cache_only
+        self.refresh = refresh
+        self.loop = None
+        self.engine = None
+
+    def start(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        self.engine = GenerationEngine(self.settings)
+        self.loop.run_until_complete(self.engine.__aenter__())
+
+    def finish(self) -> None:
         try:
-            # Generate Python template
-            python_code = generate_python_template_with_claude(problem_name, title, frs)
-
-            # Add template to definition
-            new_definition = add_python_template_to_definition(definition_content, python_code)
-
-            # Replace in content
-            content = content[:start_pos] + new_definition + content[end_pos:]
-
-            print(f"  ✓ {problem_name}: Template added")
-            stats['added_template'] += 1
+            self.loop.run_until_complete(self.engine.__aexit__(None, None, None))
+        finally:
+            self.loop.close()
+
+    def process(self, file: PipelineFile) -> Dict[str, any]:
+        return self.loop.run_until_complete(self.process_async(file))
+
+    async def process_async(self, file: PipelineFile) -> Dict[str, any]:
+        """Add Python templates to all problem definitions of a file."""
+        stats = {
+            'filename': file.filename,
+            'total_problems': len(file.definitions),
+            'already_had_template': 0,
+            'added_template': 0,
+            'failed': 0,
+            'unchanged': 0
+        }
+
+        # Definitions that need a template, in source order, with their cached code if any
+        pending = []
+        cached_code = {}
+
+        for definition in file.definitions:
+            problem = definition.entry
+
+            # Skip definitions unchanged since the last run
+            if definition.unchanged:
+                stats['unchanged'] += 1
+                continue
 
-        except Exception as e:
-            print(f"  ✗ {problem_name}: Failed - {str(e)}")
-            stats['failed'] += 1
+            # Check if already has template
+            if definition.has_template:
+                print(f"  ✓ {problem.name}: Already has template")
+                stats['already_had_template'] += 1
+                continue
 
-    # Write updated content back to file
-    if stats['added_template'] > 0:
-        with open(filepath, 'w') as f:
-            f.write(content)
-        print(f"\n✓ File updated: {stats['added_template']} templates added")
-    else:
-        print(f"\n- No changes needed")
+            # FRs and title come straight from the index
+            if not problem.frs:
+                print(f"  ✗ {problem.name}: No FRs found")
+                stats['failed'] += 1
+                continue
 
-    return stats
+            key = template_cache_key(problem.title, problem.frs, self.settings.model, PROMPT_VERSION)
+            code = None if self.refresh else self.cache.get(key)
+            if code is not None:
+                cached_code[problem.name] = code
+            elif self.cache_only:
+                print(f"  ✗ {problem.name}: Not in cache")
+                stats['failed'] += 1
+                definition.retry = True
+                continue
+            else:
+                print(f"  → {problem.name}: Generating template for {len(problem.frs)} FRs...")
+            pending.append((definition, key))
+
+        # Generate all cache misses concurrently
+        to_generate = [(d, key) for d, key in pending if d.name not in cached_code]
+        results = await self.engine.generate(
+            [build_prompt(d.entry.title, list(d.entry.frs)) for d, _ in to_generate]
+        )
+        generated = {}
+        for (definition, key), result in zip(to_generate, results):
+            generated[definition.name] = result
+            if result.error is None:
+                self.cache.put(key, extract_code(result.text))
+
+        # Apply results in the original definition order
+        for definition, key in pending:
+            if definition.name in cached_code:
+                python_code = cached_code[definition.name]
+                source = "cached"
+            else:
+                result = generated[definition.name]
+                if result.error is not None:
+                    print(f"  ✗ {definition.name}: Failed - {result.error}")
+                    stats['failed'] += 1
+                    definition.retry = True
+                    continue
+                python_code = extract_code(result.text)
+                source = "generated"
+
+            try:
+                # Add template to definition
+                definition.set_text(add_python_template_to_definition(definition.text, python_code))
+
+                print(f"  ✓ {definition.name}: Template added ({source})")
+                stats['added_template'] += 1
+
+            except Exception as e:
+                print(f"  ✗ {definition.name}: Failed - {str(e)}")
+                stats['failed'] += 1
+                definition.retry = True
+
+        if stats['unchanged']:
+            print(f"  = {stats['unchanged']} unchanged definitions skipped")
+
+        return stats
+
+    def skipped(self, filepath: str, recorded: Dict[str, any]) -> Dict[str, any]:
+        total = (recorded or {}).get('total_problems', 0)
+        return {
+            'filename': os.path.basename(filepath),
+            'total_problems': total,
+            'already_had_template': 0,
+            'added_template': 0,
+            'failed': 0,
+            'unchanged': total
+        }
+
+    def summarize(self, all_stats: List[Dict[str, any]]) -> None:
+        total_problems = sum(s['total_problems'] for s in all_stats)
+        total_already_had = sum(s['already_had_template'] for s in all_stats)
+        total_added = sum(s['added_template'] for s in all_stats)
+        total_failed = sum(s['failed'] for s in all_stats)
+        total_unchanged = sum(s['unchanged'] for s in all_stats)
+
+        print(f"Total problems: {total_problems}")
+        print(f"Unchanged (skipped): {total_unchanged}")
+        print(f"Already had templates: {total_already_had}")
+        print(f"Templates added: {total_added}")
+        print(f"Failed: {total_failed}")
+        print(f"Template cache: {self.cache.summary()}")
+
+        print("\nPer-file breakdown:")
+        for stats in all_stats:
+            if stats['added_template'] > 0 or stats['failed'] > 0:
+                print(f"  {stats['filename']}: +{stats['added_template']} added, {stats['failed']} failed")
 
 def main():
     """Main execution."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--dry-run', action='store_true',
+                        help="Print a unified diff of the pending edits instead of writing files")
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help="Maximum number of in-flight API requests")
+    parser.add_argument('--rpm', type=float, default=50,
+                        help="Requests per minute limit (0 = unlimited)")
+    parser.add_argument('--tpm', type=float, default=80000,
+                        help="Tokens per minute limit (0 = unlimited)")
+    parser.add_argument('--base-url', default=None,
+                        help="Messages API base URL, e.g. a local fake_messages_server.py")
+    parser.add_argument('--cache-path', default=DEFAULT_CACHE_PATH,
+                        help="SQLite file holding previously generated templates")
+    parser.add_argument('--cache-max-mb', type=float, default=DEFAULT_MAX_BYTES / (1024 * 1024),
+                        help="Evict least recently used templates beyond this size")
+    cache_mode = parser.add_mutually_exclusive_group()
+    cache_mode.add_argument('--cache-only', action='store_true',
+                            help="Only use cached templates; never call the API")
+    cache_mode.add_argument('--refresh', action='store_true',
+                            help="Ignore cached templates and regenerate (results are re-cached)")
+    parser.add_argument('--full', action='store_true',
+                        help="Ignore the manifest and re-scan every file and definition")
+    parser.add_argument('--template-assets', nargs='?', const='per-problem', choices=ASSET_LAYOUTS,
+                        help="Write templates to lazily loaded asset files instead of inlining them: "
+                             "one per problem, or content-addressed blobs shared by identical templates "
+                             "(with --full, also converts already processed files)")
+    args = parser.parse_args()
+
+    settings = GenerationSettings(
+        concurrency=args.concurrency,
+        requests_per_minute=args.rpm,
+        tokens_per_minute=args.tpm,
+        base_url=args.base_url,
+    )
+
     print("Python Template Generator for generated-all folder")
     print("=" * 60)
 
-    # Get all TypeScript files except tutorialAllProblems.ts
-    files = []
-    for filename in os.listdir(DEFINITIONS_DIR):
-        if filename.endswith('AllProblems.ts') and filename != 'tutorialAllProblems.ts':
-            files.append(os.path.join(DEFINITIONS_DIR, filename))
-
-    files.sort()
+    # Get all TypeScript files except tutorialAllProblems.ts,
+    # starting with cachingAllProblems.ts as requested
+    files = definition_files(DEFINITIONS_DIR, first='cachingAllProblems.ts')
 
     print(f"Found {len(files)} files to process")
     print(f"Directory: {DEFINITIONS_DIR}")
 
-    # Start with cachingAllProblems.ts as requested
-    caching_file = os.path.join(DEFINITIONS_DIR, 'cachingAllProblems.ts')
-    if caching_file in files:
-        files.remove(caching_file)
-        files.insert(0, caching_file)
-
-    all_stats = []
-
-    for filepath in files:
-        stats = process_file(filepath)
-        all_stats.append(stats)
+    cache = TemplateCache(args.cache_path, max_bytes=int(args.cache_max_mb * 1024 * 1024))
+    stage = LLMTemplateStage(settings, cache, cache_only=args.cache_only, refresh=args.refresh)
+    stages = [stage]
+    if args.template_assets:
+        stages.append(TemplateAssetStage(content_addressed=args.template_assets == 'content-addressed',
+                                         directory=DEFINITIONS_DIR))
+    pipeline = Pipeline(stages, DEFINITIONS_DIR, 'add_python_templates_generated_all',
+                        dry_run=args.dry_run, full=args.full)
+    try:
+        per_file = pipeline.run(files)
+    finally:
+        cache.close()
 
     # Print summary
     print("\n" + "=" * 60)
     print("SUMMARY")
     print("=" * 60)
 
-    total_problems = sum(s['total_problems'] for s in all_stats)
-    total_already_had = sum(s['already_had_template'] for s in all_stats)
-    total_added = sum(s['added_template'] for s in all_stats)
-    total_failed = sum(s['failed'] for s in all_stats)
-
-    print(f"\nFiles processed: {len(all_stats)}")
-    print(f"Total problems: {total_problems}")
-    print(f"Already had templates: {total_already_had}")
-    print(f"Templates added: {total_added}")
-    print(f"Failed: {total_failed}")
-
-    print("\nPer-file breakdown:")
-    for stats in all_stats:
-        if stats['added_template'] > 0 or stats['failed'] > 0:
-            print(f"  {stats['filename']}: +{stats['added_template']} added, {stats['failed']} failed")
+    print(f"\nFiles processed: {pipeline.processed_files} ({pipeline.unchanged_files} unchanged)")
+    pipeline.summarize(per_file)
 
 if __name__ == '__main__':
     main()
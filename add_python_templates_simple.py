@@ -4,102 +4,58 @@ Script to add Python templates to ALL problem definitions in generated-all folde
 This version generates templates based on pattern matching of FRs.
 """
 
+import argparse
 import re
 import os
 from typing import List, Dict, Tuple
 
+from definition_index import escape_template
+from fr_classifier import classify_fr
+from optimized_templates import active_features, optimized_function
+from template_assets import ASSET_LAYOUTS, TemplateAssetStage
+from template_pipeline import Pipeline, PipelineFile, Stage, definition_files
+
 # Directory containing the problem definition files
 DEFINITIONS_DIR = "/Users/ankurkothari/Documents/workspace/idlecampus/frontend/src/apps/system-design/builder/challenges/definitions/generated-all"
 
-def find_all_problem_definitions(content: str) -> List[Tuple[str, int, int]]:
-    """
-    Find all problem definitions in a file.
-    Returns list of (problem_name, start_pos, end_pos) tuples.
-    """
-    problems = []
-    pattern = r'export const (\w+ProblemDefinition): ProblemDefinition = \{'
-
-    for match in re.finditer(pattern, content):
-        problem_name = match.group(1)
-        start_pos = match.start()
-
-        # Find the closing brace for this definition
-        brace_count = 0
-        pos = match.end() - 1  # Start at the opening brace
-        in_backtick = False
-        in_string = False
-        escape_next = False
-
-        while pos < len(content):
-            char = content[pos]
-
-            if escape_next:
-                escape_next = False
-                pos += 1
-                continue
-
-            if char == '\\':
-                escape_next = True
-                pos += 1
-                continue
-
-            if char == '`':
-                in_backtick = not in_backtick
-                pos += 1
-                continue
-
-            if char == '"' or char == "'":
-                if not in_backtick:
-                    in_string = not in_string
-                pos += 1
-                continue
-
-            if not in_backtick and not in_string:
-                if char == '{':
-                    brace_count += 1
-                elif char == '}':
-                    brace_count -= 1
-                    if brace_count == 0:
-                        semicolon_pos = content.find(';', pos)
-                        if semicolon_pos != -1:
-                            end_pos = semicolon_pos + 1
-                            problems.append((problem_name, start_pos, end_pos))
-                            break
-
-            pos += 1
-
-    return problems
-
-def extract_frs_from_definition(definition_content: str) -> List[str]:
-    """Extract userFacingFRs from a problem definition."""
-    match = re.search(r'userFacingFRs:\s*\[(.*?)\]', definition_content, re.DOTALL)
-    if match:
-        frs_text = match.group(1)
-        frs = re.findall(r"['\"]([^'\"]*)['\"]", frs_text)
-        return [fr for fr in frs if fr.strip()]
-    return []
+# Shared runtime that --shared-runtime templates import their helpers from
+RUNTIME_MODULE = 'template_runtime'
+RUNTIME_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'template_runtime.py')
+RUNTIME_TS_FILENAME = 'pythonTemplateRuntime.ts'
+
+# Pattern -> (runtime helpers implementing it, storage those helpers use)
+SHARED_HELPERS = {
+    'create_user': (['create_user'], 'users'),
+    'create_post': (['create_post'], 'posts'),
+    'create_item': (['create_item'], 'items'),
+    'get_feed': (['get_feed'], 'posts'),
+    'search': (['search'], 'items'),
+    'get_item': (['get_item'], 'items'),
+    'update_item': (['update_item'], 'items'),
+    'delete_item': (['delete_item'], 'items'),
+    'add_reaction': (['add_reaction'], 'reactions'),
+    'follow_user': (['follow_user'], 'relationships'),
+    'cache': (['cache_item', 'get_from_cache'], 'cache'),
+    'track_event': (['track_event'], 'events'),
+    'shorten_url': (['shorten_url', 'resolve_url'], 'urls'),
+    'blacklist': (['load_blacklist', 'add_to_blacklist', 'is_blacklisted'], 'blacklist'),
+}
 
 def has_python_template(definition_content: str) -> bool:
     """Check if a problem definition already has pythonTemplate."""
     return 'pythonTemplate:' in definition_content or 'pythonTemplate :' in definition_content
 
-def extract_problem_title(definition_content: str) -> str:
-    """Extract the title from a problem definition."""
-    match = re.search(r"title:\s*['\"]([^'\"]*)['\"]", definition_content)
-    if match:
-        return match.group(1)
-    return "Unknown Problem"
-
 def generate_function_from_fr(fr: str, fr_index: int) -> str:
     """Generate a Python function based on an FR."""
     fr_lower = fr.lower()
 
-    # Detect common patterns and generate appropriate functions
+    # Classify the FR in one pass (see fr_classifier for keywords and priority)
+    pattern = classify_fr(fr).pattern
     function_code = ""
 
     # Pattern: Store/Save/Create/Add
-    if any(word in fr_lower for word in ['store', 'save', 'create', 'add', 'register', 'upload', 'insert', 'write']):
-        if 'user' in fr_lower or 'profile' in fr_lower or 'account' in fr_lower:
+    if pattern in ('create_user', 'create_post', 'create_item'):
+        if pattern == 'create_user':
             function_code = f'''def create_user(user_id: str, **kwargs) -> Dict:
     """
     FR-{fr_index+1}: {fr}
@@ -111,7 +67,7 @@ def generate_function_from_fr(fr: str, fr_index: int) -> str:
         **kwargs
     }}
     return users[user_id]'''
-        elif 'post' in fr_lower or 'content' in fr_lower or 'message' in fr_lower:
+        elif pattern == 'create_post':
             function_code = f'''def create_post(post_id: str, user_id: str, content: str, **kwargs) -> Dict:
     """
     FR-{fr_index+1}: {fr}
@@ -139,8 +95,8 @@ def generate_function_from_fr(fr: str, fr_index: int) -> str:
     return items[item_id]'''
 
     # Pattern: Get/Retrieve/Fetch/Read/Query
-    elif any(word in fr_lower for word in ['get', 'retrieve', 'fetch', 'read', 'query', 'search', 'find', 'serve', 'return']):
-        if 'feed' in fr_lower or 'timeline' in fr_lower:
+    elif pattern in ('get_feed', 'search', 'get_item'):
+        if pattern == 'get_feed':
             function_code = f'''def get_feed(user_id: str, limit: int = 20) -> List[Dict]:
     """
     FR-{fr_index+1}: {fr}
@@ -148,7 +104,7 @@ def generate_function_from_fr(fr: str, fr_index: int) -> str:
     """
     feed_items = sorted(posts.values(), key=lambda x: x['created_at'], reverse=True)
     return feed_items[:limit]'''
-        elif 'search' in fr_lower:
+        elif pattern == 'search':
             function_code = f'''def search(query: str, limit: int = 20) -> List[Dict]:
     """
     FR-{fr_index+1}: {fr}
@@ -168,7 +124,7 @@ def generate_function_from_fr(fr: str, fr_index: int) -> str:
     return items.get(item_id)'''
 
     # Pattern: Update/Modify/Edit
-    elif any(word in fr_lower for word in ['update', 'modify', 'edit', 'change']):
+    elif pattern == 'update_item':
         function_code = f'''def update_item(item_id: str, **kwargs) -> Dict:
     """
     FR-{fr_index+1}: {fr}
@@ -181,7 +137,7 @@ def generate_function_from_fr(fr: str, fr_index: int) -> str:
     return None'''
 
     # Pattern: Delete/Remove
-    elif any(word in fr_lower for word in ['delete', 'remove']):
+    elif pattern == 'delete_item':
         function_code = f'''def delete_item(item_id: str) -> bool:
     """
     FR-{fr_index+1}: {fr}
@@ -193,7 +149,7 @@ def generate_function_from_fr(fr: str, fr_index: int) -> str:
     return False'''
 
     # Pattern: Like/Vote/React
-    elif any(word in fr_lower for word in ['like', 'vote', 'react', 'upvote', 'downvote']):
+    elif pattern == 'add_reaction':
         function_code = f'''def add_reaction(item_id: str, user_id: str, reaction_type: str = 'like') -> Dict:
     """
     FR-{fr_index+1}: {fr}
@@ -209,7 +165,7 @@ def generate_function_from_fr(fr: str, fr_index: int) -> str:
     return reactions[reaction_id]'''
 
     # Pattern: Follow/Friend/Subscribe
-    elif any(word in fr_lower for word in ['follow', 'friend', 'subscribe']):
+    elif pattern == 'follow_user':
         function_code = f'''def follow_user(follower_id: str, followee_id: str) -> Dict:
     """
     FR-{fr_index+1}: {fr}
@@ -224,7 +180,7 @@ def generate_function_from_fr(fr: str, fr_index: int) -> str:
     return relationships[relationship_id]'''
 
     # Pattern: Cache/CDN/Serve
-    elif any(word in fr_lower for word in ['cache', 'cdn', 'edge']):
+    elif pattern == 'cache':
         function_code = f'''def cache_item(key: str, value: any, ttl: int = 3600) -> bool:
     """
     FR-{fr_index+1}: {fr}
@@ -249,7 +205,7 @@ def get_from_cache(key: str) -> any:
     return None'''
 
     # Pattern: Analytics/Track/Monitor
-    elif any(word in fr_lower for word in ['analytic', 'track', 'monitor', 'metric', 'count']):
+    elif pattern == 'track_event':
         function_code = f'''def track_event(event_type: str, item_id: str, metadata: Dict = None) -> Dict:
     """
     FR-{fr_index+1}: {fr}
@@ -265,6 +221,65 @@ def get_from_cache(key: str) -> any:
     }}
     return events[event_id]'''
 
+    # Pattern: URL shortener
+    elif pattern == 'shorten_url':
+        function_code = f'''def shorten_url(long_url: str) -> Dict:
+    """
+    FR-{fr_index+1}: {fr}
+    Naive implementation - scans for an existing code, else numbers the URL
+    """
+    for record in urls.values():
+        if record['long_url'] == long_url:
+            return record
+    code = format(len(urls) + 1, 'x')
+    urls[code] = {{
+        'code': code,
+        'long_url': long_url,
+        'created_at': datetime.now()
+    }}
+    return urls[code]
+
+def resolve_url(code: str) -> Optional[str]:
+    """
+    FR-{fr_index+1}: {fr}
+    Naive implementation - looks up the long URL of a short code
+    """
+    record = urls.get(code)
+    return record['long_url'] if record else None'''
+
+    # Pattern: Blacklist/Denylist/Spam
+    elif pattern == 'blacklist':
+        function_code = f'''def load_blacklist(entries: List[str]) -> int:
+    """
+    FR-{fr_index+1}: {fr}
+    Naive implementation - adds the entries one by one
+    """
+    for entry in entries:
+        add_to_blacklist(entry)
+    return len(blacklist)
+
+def add_to_blacklist(entry: str) -> bool:
+    """
+    FR-{fr_index+1}: {fr}
+    Naive implementation - stores the domain or URL in memory
+    """
+    blacklist[entry.lower()] = {{
+        'entry': entry,
+        'created_at': datetime.now()
+    }}
+    return True
+
+def is_blacklisted(url: str) -> bool:
+    """
+    FR-{fr_index+1}: {fr}
+    Naive implementation - checks the URL against every entry
+    """
+    url_lower = url.lower()
+    for entry in blacklist:
+        if entry in url_lower:
+            return True
+    return False'''
+
     # Default: generic function
     else:
         func_name = re.sub(r'[^a-z0-9_]', '_', fr_lower[:40])
@@ -280,61 +295,168 @@ def get_from_cache(key: str) -> any:
 
     return function_code
 
-def generate_python_template(title: str, frs: List[str]) -> str:
-    """Generate a naive Python implementation based on FRs."""
+def function_names(function_code: str) -> Tuple[str, ...]:
+    """Names of the functions defined by a generated code block."""
+    return tuple(re.findall(r'^def (\w+)', function_code, re.MULTILINE))
+
+def merge_imports(lines: List[str]) -> List[str]:
+    """Deduplicate import lines, combining `from m import ...` lines per module."""
+    plain = []
+    from_imports: Dict[str, List[str]] = {}
+    for line in lines:
+        match = re.match(r'from (\S+) import (.+)$', line)
+        if match is None:
+            if line not in plain:
+                plain.append(line)
+            continue
+        names = from_imports.setdefault(match.group(1), [])
+        names.extend(name.strip() for name in match.group(2).split(',') if name.strip() not in names)
+    return plain + [f"from {module} import {', '.join(names)}" for module, names in from_imports.items()]
+
+def generate_python_template(title: str, frs: List[str], shared_runtime: bool = False,
+                             optimized: bool = False) -> str:
+    """
+    Generate a naive Python implementation based on FRs.
+    With shared_runtime, common helpers are imported from the runtime module
+    and only problem-specific functions are emitted. With optimized, patterns
+    that have an optimized variant (see optimized_templates) use it instead.
+    """
+    if shared_runtime:
+        return generate_shared_runtime_template(title, frs)
 
     # Determine what storage structures we need
     storage_vars = set()
 
     for fr in frs:
-        fr_lower = fr.lower()
-        if any(word in fr_lower for word in ['user', 'profile', 'account']):
-            storage_vars.add('users = {}')
-        if any(word in fr_lower for word in ['post', 'content', 'article', 'status']):
-            storage_vars.add('posts = {}')
-        if any(word in fr_lower for word in ['message', 'chat', 'comment']):
-            storage_vars.add('messages = {}')
-        if any(word in fr_lower for word in ['like', 'vote', 'react', 'upvote']):
-            storage_vars.add('reactions = {}')
-        if any(word in fr_lower for word in ['follow', 'friend', 'subscribe']):
-            storage_vars.add('relationships = {}')
-        if any(word in fr_lower for word in ['cache', 'cdn']):
-            storage_vars.add('cache = {}')
-        if any(word in fr_lower for word in ['event', 'analytic', 'track', 'metric']):
-            storage_vars.add('events = {}')
+        storage_vars.update(f'{name} = {{}}' for name in classify_fr(fr).storage)
 
     # Default storage if nothing specific detected
     if not storage_vars:
         storage_vars.add('items = {}')
         storage_vars.add('data = {}')
 
+    features = active_features({classify_fr(fr).pattern for fr in frs}) if optimized else []
+    for feature in features:
+        storage_vars.update(f'{name} = {{}}' for name in feature.records)
+
     # Build the template
-    template_parts = [
-        "from datetime import datetime",
-        "from typing import List, Dict, Optional, Any",
-        "",
-        "# In-memory storage (naive implementation)"
-    ]
+    if features:
+        imports = ["from datetime import datetime"]
+        for feature in features:
+            imports.extend(feature.imports)
+        template_parts = merge_imports(imports) + [
+            "from typing import List, Dict, Optional, Any, Set, Tuple",
+            "",
+            "# In-memory storage"
+        ]
+    else:
+        template_parts = [
+            "from datetime import datetime",
+            "from typing import List, Dict, Optional, Any",
+            "",
+            "# In-memory storage (naive implementation)"
+        ]
 
     # Add storage variables
     template_parts.extend(sorted(storage_vars))
     template_parts.append("")
 
-    # Generate functions for each FR
+    # Indexes and helpers of the optimized variants
+    for feature in features:
+        template_parts.extend(feature.storage)
+        template_parts.append("")
+    for feature in features:
+        if feature.helpers:
+            template_parts.append(feature.helpers)
+            template_parts.append("")
+
+    # Generate functions for each FR, once per function name
+    seen = set()
     for i, fr in enumerate(frs):
+        function_code = (optimized_function(classify_fr(fr).pattern, fr, i, features)
+                         or generate_function_from_fr(fr, i))
+        names = function_names(function_code)
+        if names in seen:
+            continue
+        seen.add(names)
+        template_parts.append(function_code)
+        template_parts.append("")
+
+    return "\n".join(template_parts).strip()
+
+def generate_shared_runtime_template(title: str, frs: List[str]) -> str:
+    """Generate a template that imports shared helpers from the runtime module."""
+    storage = set()
+    helpers = []
+    notes = []
+    local_functions = []
+    seen = set()
+
+    for i, fr in enumerate(frs):
+        fr_class = classify_fr(fr)
+        storage.update(fr_class.storage)
+
+        if fr_class.pattern in SHARED_HELPERS:
+            names, helper_storage = SHARED_HELPERS[fr_class.pattern]
+            storage.add(helper_storage)
+            notes.append(f"# FR-{i+1}: {fr} -> {', '.join(names)}")
+            helpers.extend(name for name in names if name not in helpers)
+            continue
+
+        # Problem-specific code stays in the template
         function_code = generate_function_from_fr(fr, i)
+        names = function_names(function_code)
+        if names in seen:
+            continue
+        seen.add(names)
+        local_functions.append(function_code)
+
+    template_parts = [
+        "from datetime import datetime",
+        "from typing import List, Dict, Optional, Any",
+        "",
+    ]
+
+    imports = sorted(storage) + helpers
+    if imports:
+        template_parts.append(f"# Shared naive storage and helpers ({RUNTIME_MODULE})")
+        template_parts.append(f"from {RUNTIME_MODULE} import (")
+        template_parts.extend(f"    {name}," for name in imports)
+        template_parts.append(")")
+        template_parts.append("")
+
+    if notes:
+        template_parts.extend(notes)
+        template_parts.append("")
+
+    for function_code in local_functions:
         template_parts.append(function_code)
         template_parts.append("")
 
     return "\n".join(template_parts).strip()
 
+def write_runtime_module(directory: str) -> str:
+    """Write the shared runtime as a TS module next to the definitions. Returns its path."""
+    with open(RUNTIME_SOURCE, 'r') as f:
+        runtime_code = f.read()
+
+    path = os.path.join(directory, RUNTIME_TS_FILENAME)
+    with open(path, 'w') as f:
+        f.write(
+            f"// Generated by add_python_templates_simple.py --shared-runtime from {os.path.basename(RUNTIME_SOURCE)}.\n"
+            f"// Register it as the `{RUNTIME_MODULE}` module before running pythonTemplates that import it.\n"
+            f"export const PYTHON_TEMPLATE_RUNTIME_MODULE = '{RUNTIME_MODULE}';\n\n"
+            f"export const pythonTemplateRuntime = `{escape_template(runtime_code)}`;\n"
+        )
+    return path
+
 def add_python_template_to_definition(definition_content: str, python_code: str) -> str:
     """Add pythonTemplate to a problem definition."""
     if has_python_template(definition_content):
         return definition_content
 
     # Escape backticks and template literals in Python code
-    escaped_code = python_code.replace('\\', '\\\\').replace('`', '\\`').replace('${', '\\${')
+    escaped_code = escape_template(python_code)
 
     # Find the closing }; of the definition
     match = re.search(r'(\n\};)\s*$', definition_content)
@@ -348,116 +470,164 @@ def add_python_template_to_definition(definition_content: str, python_code: str)
 
     return definition_content
 
-def process_file(filepath: str) -> Dict[str, any]:
-    """Process a single file, adding Python templates to all problem definitions."""
-    filename = os.path.basename(filepath)
-    print(f"\n{'='*60}")
-    print(f"Processing: {filename}")
-    print(f"{'='*60}")
-
-    with open(filepath, 'r') as f:
-        content = f.read()
-
-    problems = find_all_problem_definitions(content)
-    print(f"Found {len(problems)} problem definitions")
-
-    stats = {
-        'filename': filename,
-        'total_problems': len(problems),
-        'already_had_template': 0,
-        'added_template': 0,
-        'failed': 0
-    }
-
-    # Process in reverse order so positions don't shift
-    problems.reverse()
-
-    for problem_name, start_pos, end_pos in problems:
-        definition_content = content[start_pos:end_pos]
-
-        if has_python_template(definition_content):
-            print(f"  ✓ {problem_name}: Already has template")
-            stats['already_had_template'] += 1
-            continue
-
-        frs = extract_frs_from_definition(definition_content)
-        if not frs:
-            print(f"  ✗ {problem_name}: No FRs found")
-            stats['failed'] += 1
-            continue
-
-        title = extract_problem_title(definition_content)
-        print(f"  → {problem_name}: Generating template for {len(frs)} FRs...")
-
-        try:
-            python_code = generate_python_template(title, frs)
-            new_definition = add_python_template_to_definition(definition_content, python_code)
-            content = content[:start_pos] + new_definition + content[end_pos:]
-
-            print(f"  ✓ {problem_name}: Template added")
-            stats['added_template'] += 1
+class RuleTemplateStage(Stage):
+    """Pipeline stage adding rule-based pythonTemplates to definitions without one."""
+    name = 'generate'
+
+    def __init__(self, shared_runtime: bool = False, optimized: bool = False):
+        self.shared_runtime = shared_runtime
+        self.optimized = optimized
+
+    def process(self, file: PipelineFile) -> Dict[str, any]:
+        """
+        Add Python templates to all problem definitions of a file.
+        With shared_runtime, stats['bytes_saved'] is the size reduction versus inlining.
+        """
+        stats = {
+            'filename': file.filename,
+            'total_problems': len(file.definitions),
+            'already_had_template': 0,
+            'added_template': 0,
+            'failed': 0,
+            'unchanged': 0,
+            'bytes_saved': 0
+        }
+
+        for definition in file.definitions:
+            problem_name = definition.name
+
+            if definition.unchanged:
+                stats['unchanged'] += 1
+                continue
 
-        except Exception as e:
-            print(f"  ✗ {problem_name}: Failed - {str(e)}")
-            stats['failed'] += 1
+            if definition.has_template:
+                print(f"  ✓ {problem_name}: Already has template")
+                stats['already_had_template'] += 1
+                continue
 
-    # Write updated content back to file
-    if stats['added_template'] > 0:
-        with open(filepath, 'w') as f:
-            f.write(content)
-        print(f"\n✓ File updated: {stats['added_template']} templates added")
-    else:
-        print(f"\n- No changes needed")
+            frs = list(definition.entry.frs)
+            if not frs:
+                print(f"  ✗ {problem_name}: No FRs found")
+                stats['failed'] += 1
+                continue
 
-    return stats
+            title = definition.entry.title
+            print(f"  → {problem_name}: Generating template for {len(frs)} FRs...")
+
+            try:
+                python_code = generate_python_template(title, frs, shared_runtime=self.shared_runtime,
+                                                       optimized=self.optimized)
+                if self.shared_runtime:
+                    inline_code = generate_python_template(title, frs)
+                    stats['bytes_saved'] += (
+                        len(escape_template(inline_code).encode('utf-8'))
+                        - len(escape_template(python_code).encode('utf-8'))
+                    )
+                definition.set_text(add_python_template_to_definition(definition.text, python_code))
+
+                print(f"  ✓ {problem_name}: Template added")
+                stats['added_template'] += 1
+
+            except Exception as e:
+                print(f"  ✗ {problem_name}: Failed - {str(e)}")
+                stats['failed'] += 1
+                definition.retry = True
+
+        if stats['unchanged']:
+            print(f"  = {stats['unchanged']} unchanged definitions skipped")
+
+        return stats
+
+    def skipped(self, filepath: str, recorded: Dict[str, any]) -> Dict[str, any]:
+        total = (recorded or {}).get('total_problems', 0)
+        return {
+            'filename': os.path.basename(filepath),
+            'total_problems': total,
+            'already_had_template': 0,
+            'added_template': 0,
+            'failed': 0,
+            'unchanged': total,
+            'bytes_saved': 0
+        }
+
+    def summarize(self, all_stats: List[Dict[str, any]]) -> None:
+        total_problems = sum(s['total_problems'] for s in all_stats)
+        total_already_had = sum(s['already_had_template'] for s in all_stats)
+        total_added = sum(s['added_template'] for s in all_stats)
+        total_failed = sum(s['failed'] for s in all_stats)
+        total_unchanged = sum(s['unchanged'] for s in all_stats)
+        total_saved = sum(s['bytes_saved'] for s in all_stats)
+
+        print(f"Total problems: {total_problems}")
+        print(f"Unchanged (skipped): {total_unchanged}")
+        print(f"Already had templates: {total_already_had}")
+        print(f"Templates added: {total_added}")
+        print(f"Failed: {total_failed}")
+        if self.shared_runtime:
+            print(f"Bytes saved by shared runtime: {total_saved}")
+
+        print("\nPer-file breakdown:")
+        for stats in all_stats:
+            if stats['added_template'] > 0 or stats['failed'] > 0:
+                line = f"  {stats['filename']}: +{stats['added_template']} added, {stats['failed']} failed"
+                if self.shared_runtime:
+                    line += f", {stats['bytes_saved']} bytes saved"
+                print(line)
 
 def main():
     """Main execution."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--dry-run', action='store_true',
+                        help="Print a unified diff of the pending edits instead of writing files")
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                        help="Number of worker processes (files are processed independently)")
+    parser.add_argument('--full', action='store_true',
+                        help="Ignore the manifest and re-scan every file and definition")
+    parser.add_argument('--shared-runtime', action='store_true',
+                        help=f"Import common helpers from a shared {RUNTIME_MODULE} module "
+                             f"(written to {RUNTIME_TS_FILENAME}) instead of inlining them")
+    parser.add_argument('--optimized', action='store_true',
+                        help="Use the indexed variants of patterns that have one (search, ...) "
+                             "instead of the naive full scans")
+    parser.add_argument('--template-assets', nargs='?', const='per-problem', choices=ASSET_LAYOUTS,
+                        help="Write templates to lazily loaded asset files instead of inlining them: "
+                             "one per problem, or content-addressed blobs shared by identical templates "
+                             "(with --full, also converts already processed files)")
+    args = parser.parse_args()
+    if args.optimized and args.shared_runtime:
+        parser.error("--optimized templates cannot use the naive shared runtime")
+
     print("Python Template Generator for generated-all folder")
     print("=" * 60)
 
-    # Get all TypeScript files except tutorialAllProblems.ts
-    files = []
-    for filename in os.listdir(DEFINITIONS_DIR):
-        if filename.endswith('AllProblems.ts') and filename != 'tutorialAllProblems.ts':
-            files.append(os.path.join(DEFINITIONS_DIR, filename))
-
-    files.sort()
+    # Get all TypeScript files except tutorialAllProblems.ts,
+    # starting with cachingAllProblems.ts as requested
+    files = definition_files(DEFINITIONS_DIR, first='cachingAllProblems.ts')
 
     print(f"Found {len(files)} files to process")
 
-    # Start with cachingAllProblems.ts as requested
-    caching_file = os.path.join(DEFINITIONS_DIR, 'cachingAllProblems.ts')
-    if caching_file in files:
-        files.remove(caching_file)
-        files.insert(0, caching_file)
+    # The runtime is emitted once per run rather than copied into every template
+    if args.shared_runtime and not args.dry_run:
+        runtime_path = write_runtime_module(DEFINITIONS_DIR)
+        print(f"✓ Shared runtime written: {os.path.basename(runtime_path)}")
 
-    all_stats = []
+    stages = [RuleTemplateStage(shared_runtime=args.shared_runtime, optimized=args.optimized)]
+    if args.template_assets:
+        stages.append(TemplateAssetStage(content_addressed=args.template_assets == 'content-addressed',
+                                         directory=DEFINITIONS_DIR))
 
-    for filepath in files:
-        stats = process_file(filepath)
-        all_stats.append(stats)
+    # Files this script already finished with are skipped without being lexed
+    pipeline = Pipeline(stages, DEFINITIONS_DIR, 'add_python_templates_simple',
+                        dry_run=args.dry_run, full=args.full, jobs=args.jobs)
+    per_file = pipeline.run(files)
 
     # Print summary
     print("\n" + "=" * 60)
     print("SUMMARY")
     print("=" * 60)
 
-    total_problems = sum(s['total_problems'] for s in all_stats)
-    total_already_had = sum(s['already_had_template'] for s in all_stats)
-    total_added = sum(s['added_template'] for s in all_stats)
-    total_failed = sum(s['failed'] for s in all_stats)
-
-    print(f"\nFiles processed: {len(all_stats)}")
-    print(f"Total problems: {total_problems}")
-    print(f"Already had templates: {total_already_had}")
-    print(f"Templates added: {total_added}")
-    print(f"Failed: {total_failed}")
-
-    print("\nPer-file breakdown:")
-    for stats in all_stats:
-        if stats['added_template'] > 0 or stats['failed'] > 0:
-            print(f"  {stats['filename']}: +{stats['added_template']} added, {stats['failed']} failed")
+    print(f"\nFiles processed: {pipeline.processed_files} ({pipeline.unchanged_files} unchanged)")
+    pipeline.summarize(per_file)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Bounded-concurrency asyncio engine for Messages API generation.
+
+Requests run through a semaphore (concurrency limit) and two token buckets
+(requests/min and tokens/min) over one pooled keep-alive HTTP client.
+429s, 5xx responses and connection errors are retried with jittered
+exponential backoff. Results are returned in the order the prompts were
+given, whatever order they complete in.
+
+Point `base_url` at fake_messages_server.py to measure throughput offline.
+"""
+
+import asyncio
+import random
+import time
+from typing import List, NamedTuple, Optional
+
+import anthropic
+import httpx
+
+DEFAULT_MODEL = "claude-sonnet-4-5-20250929"
+
+
+class GenerationSettings(NamedTuple):
+    """Knobs for a generation run."""
+    model: str = DEFAULT_MODEL
+    max_tokens: int = 2000
+    concurrency: int = 8
+    requests_per_minute: float = 50
+    tokens_per_minute: float = 80000
+    max_retries: int = 6
+    backoff_base: float = 1.0
+    backoff_cap: float = 60.0
+    base_url: Optional[str] = None
+
+
+class GenerationResult(NamedTuple):
+    """Response text for one prompt, or the error that ended its retries."""
+    text: Optional[str]
+    error: Optional[str]
+    attempts: int
+
+
+class TokenBucket:
+    """
+    Async token bucket refilled continuously at `rate_per_minute`.
+    A rate of 0 or None disables the limit.
+    """
+
+    def __init__(self, rate_per_minute: Optional[float], capacity: Optional[float] = None):
+        self.rate = (rate_per_minute or 0) / 60.0
+        self.capacity = capacity if capacity is not None else (rate_per_minute or 0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1) -> float:
+        """Wait until `amount` tokens are available and take them; returns the amount taken."""
+        if not self.rate:
+            return amount
+        # A request larger than the bucket would never fit; let it drain the bucket instead
+        amount = min(amount, self.capacity)
+        async with self.lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return amount
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def refund(self, amount: float) -> None:
+        """
+        Return tokens that were reserved but not used. A negative amount charges
+        tokens used beyond the reservation, and may leave the bucket in debt.
+        """
+        if self.rate and amount:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+def estimate_tokens(prompt: str, max_tokens: int) -> int:
+    """Rough upper bound on the tokens a request will consume."""
+    return len(prompt) // 4 + max_tokens
+
+
+def is_retryable(error: Exception) -> bool:
+    """Rate limits, server errors and dropped connections are worth retrying."""
+    if isinstance(error, anthropic.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return isinstance(error, (anthropic.APIConnectionError, anthropic.APITimeoutError))
+
+
+def backoff_delay(attempt: int, settings: GenerationSettings, error: Exception = None) -> float:
+    """Full-jitter exponential backoff, honouring Retry-After when the server sends one."""
+    if isinstance(error, anthropic.APIStatusError):
+        retry_after = error.response.headers.get('retry-after')
+        try:
+            if retry_after is not None:
+                return float(retry_after)
+        except ValueError:
+            pass
+    return random.uniform(0, min(settings.backoff_cap, settings.backoff_base * 2 ** attempt))
+
+
+class GenerationEngine:
+    """
+    Shares one HTTP connection pool and the rate-limit buckets across every
+    batch generated during a run. Use as an async context manager.
+    """
+
+    def __init__(self, settings: GenerationSettings):
+        self.settings = settings
+        self.request_bucket = TokenBucket(settings.requests_per_minute)
+        self.token_bucket = TokenBucket(settings.tokens_per_minute)
+        self.semaphore = asyncio.Semaphore(settings.concurrency)
+        self.client = None
+
+    async def __aenter__(self) -> 'GenerationEngine':
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        if self.client is not None:
+            await self.client.close()
+
+    def _get_client(self) -> anthropic.AsyncAnthropic:
+        # Created on first use, so runs that never call the API need no key
+        if self.client is None:
+            limits = httpx.Limits(
+                max_connections=self.settings.concurrency,
+                max_keepalive_connections=self.settings.concurrency,
+            )
+            self.client = anthropic.AsyncAnthropic(
+                base_url=self.settings.base_url,
+                # Retries are handled here so they respect the buckets
+                max_retries=0,
+                http_client=anthropic.DefaultAsyncHttpxClient(limits=limits),
+            )
+        return self.client
+
+    async def _generate_one(self, prompt: str) -> GenerationResult:
+        settings = self.settings
+        client = self._get_client()
+        estimate = estimate_tokens(prompt, settings.max_tokens)
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                async with self.semaphore:
+                    await self.request_bucket.acquire()
+                    reserved = await self.token_bucket.acquire(estimate)
+                    try:
+                        message = await client.messages.create(
+                            model=settings.model,
+                            max_tokens=settings.max_tokens,
+                            messages=[{"role": "user", "content": prompt}],
+                        )
+                    except Exception:
+                        # A failed attempt consumed nothing; the retry reserves again
+                        self.token_bucket.refund(reserved)
+                        raise
+                used = message.usage.input_tokens + message.usage.output_tokens
+                self.token_bucket.refund(reserved - used)
+                text = ''.join(block.text for block in message.content if block.type == 'text')
+            except Exception as e:
+                if attempt > settings.max_retries or not is_retryable(e):
+                    return GenerationResult(None, str(e), attempt)
+                await asyncio.sleep(backoff_delay(attempt - 1, settings, e))
+                continue
+
+            if not text:
+                return GenerationResult(None, "empty response", attempt)
+            return GenerationResult(text, None, attempt)
+
+    async def generate(self, prompts: List[str]) -> List[GenerationResult]:
+        """Generate every prompt concurrently; results are in prompt order."""
+        return await asyncio.gather(*(self._generate_one(prompt) for prompt in prompts))
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: compiled FR classifier vs the original keyword cascades.
+
+Generates synthetic FRs from the generator's keyword vocabulary plus filler
+words, checks that both classifiers agree on every FR, and reports FRs/sec.
+
+    python3 bench_fr_classifier.py --count 100000
+"""
+
+import argparse
+import random
+import re
+import time
+
+from fr_classifier import GENERIC_PATTERN, _classify
+
+FILLER = [
+    'users', 'can', 'the', 'a', 'system', 'should', 'with', 'low', 'latency', 'for', 'data',
+    'global', 'accounts', 'likely', 'recount', 'address', 'statuses', 'edges', 'streams',
+    'replicas', 'per', 'region', 'short', 'url', 'long', 'referrer', 'geographic', 'videos',
+    'shortest', 'shortlist', 'route',
+]
+KEYWORDS = [
+    'store', 'save', 'create', 'add', 'register', 'upload', 'insert', 'write', 'get', 'retrieve',
+    'fetch', 'read', 'query', 'search', 'find', 'serve', 'return', 'update', 'modify', 'edit',
+    'change', 'delete', 'remove', 'like', 'vote', 'react', 'upvote', 'downvote', 'follow', 'friend',
+    'subscribe', 'cache', 'cdn', 'edge', 'analytic', 'track', 'monitor', 'metric', 'count', 'user',
+    'profile', 'account', 'post', 'content', 'message', 'feed', 'timeline', 'article', 'status',
+    'chat', 'comment', 'event', 'link', 'blacklist', 'denylist', 'blocklist', 'spam', 'shorten',
+    'shortener', 'domain',
+]
+
+# FRs a keyword combination must not capture, with the pattern they should get
+EDGE_CASES = [
+    ('Find the shortest route and share a link', 'get_item'),
+    ('Shortlist candidates and store their profile URL', 'create_user'),
+    ('Shorten a long link', 'shorten_url'),
+    ('URL shortener with custom aliases', 'shorten_url'),
+    ('Users can mark emails as spam', 'generic'),
+    ('Filter spam comments on posts', 'generic'),
+    ('Rate-limit spam messages', 'generic'),
+    ('Users can report spam and store the message', 'create_user'),
+    ('Block spam links and malicious domains', 'blacklist'),
+]
+
+
+def legacy_pattern(fr: str) -> str:
+    """The cascade generate_function_from_fr used before fr_classifier."""
+    fr_lower = fr.lower()
+    # Keyword combinations, added to the classifier after the cascades
+    if (any(word in fr_lower for word in ['blacklist', 'denylist', 'blocklist'])
+            or ('spam' in fr_lower and any(word in fr_lower for word in ['url', 'link', 'domain']))):
+        return 'blacklist'
+    words = set(re.findall(r'[a-z]+', fr_lower))
+    if words & {'short', 'shorten', 'shortener'} and ('url' in fr_lower or 'link' in fr_lower):
+        return 'shorten_url'
+    if any(word in fr_lower for word in ['store', 'save', 'create', 'add', 'register', 'upload', 'insert', 'write']):
+        if 'user' in fr_lower or 'profile' in fr_lower or 'account' in fr_lower:
+            return 'create_user'
+        elif 'post' in fr_lower or 'content' in fr_lower or 'message' in fr_lower:
+            return 'create_post'
+        return 'create_item'
+    elif any(word in fr_lower for word in ['get', 'retrieve', 'fetch', 'read', 'query', 'search', 'find', 'serve', 'return']):
+        if 'feed' in fr_lower or 'timeline' in fr_lower:
+            return 'get_feed'
+        elif 'search' in fr_lower:
+            return 'search'
+        return 'get_item'
+    elif any(word in fr_lower for word in ['update', 'modify', 'edit', 'change']):
+        return 'update_item'
+    elif any(word in fr_lower for word in ['delete', 'remove']):
+        return 'delete_item'
+    elif any(word in fr_lower for word in ['like', 'vote', 'react', 'upvote', 'downvote']):
+        return 'add_reaction'
+    elif any(word in fr_lower for word in ['follow', 'friend', 'subscribe']):
+        return 'follow_user'
+    elif any(word in fr_lower for word in ['cache', 'cdn', 'edge']):
+        return 'cache'
+    elif any(word in fr_lower for word in ['analytic', 'track', 'monitor', 'metric', 'count']):
+        return 'track_event'
+    return GENERIC_PATTERN
+
+
+def legacy_storage(fr: str) -> frozenset:
+    """The storage cascade generate_python_template used before fr_classifier."""
+    fr_lower = fr.lower()
+    storage = set()
+    if any(word in fr_lower for word in ['user', 'profile', 'account']):
+        storage.add('users')
+    if any(word in fr_lower for word in ['post', 'content', 'article', 'status']):
+        storage.add('posts')
+    if any(word in fr_lower for word in ['message', 'chat', 'comment']):
+        storage.add('messages')
+    if any(word in fr_lower for word in ['like', 'vote', 'react', 'upvote']):
+        storage.add('reactions')
+    if any(word in fr_lower for word in ['follow', 'friend', 'subscribe']):
+        storage.add('relationships')
+    if any(word in fr_lower for word in ['cache', 'cdn']):
+        storage.add('cache')
+    if any(word in fr_lower for word in ['event', 'analytic', 'track', 'metric']):
+        storage.add('events')
+    if (any(word in fr_lower for word in ['blacklist', 'denylist', 'blocklist'])
+            or ('spam' in fr_lower and any(word in fr_lower for word in ['url', 'link', 'domain']))):
+        storage.add('blacklist')
+    elif (set(re.findall(r'[a-z]+', fr_lower)) & {'short', 'shorten', 'shortener'}
+          and ('url' in fr_lower or 'link' in fr_lower)):
+        storage.add('urls')
+    return frozenset(storage)
+
+
+def synthetic_frs(count: int, seed: int = 42):
+    rng = random.Random(seed)
+    frs = []
+    for _ in range(count):
+        words = rng.choices(FILLER, k=rng.randint(4, 12))
+        for _ in range(rng.randint(0, 3)):
+            words.insert(rng.randrange(len(words) + 1), rng.choice(KEYWORDS))
+        fr = ' '.join(words)
+        frs.append(fr.capitalize() if rng.random() < 0.5 else fr)
+    return frs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    frs = synthetic_frs(args.count, args.seed)
+
+    started = time.perf_counter()
+    legacy = [(legacy_pattern(fr), legacy_storage(fr)) for fr in frs]
+    legacy_time = time.perf_counter() - started
+
+    # _classify bypasses the memo so every FR is really classified
+    started = time.perf_counter()
+    compiled = [tuple(_classify(fr)) for fr in frs]
+    compiled_time = time.perf_counter() - started
+
+    mismatches = sum(1 for a, b in zip(legacy, compiled) if a != b)
+    for fr, expected in EDGE_CASES:
+        for name, pattern in (('legacy', legacy_pattern(fr)), ('compiled', _classify(fr).pattern)):
+            if pattern != expected:
+                print(f"✗ {name}: {fr!r} -> {pattern}, expected {expected}")
+                mismatches += 1
+
+    print(f"FRs classified: {len(frs)}")
+    print(f"Legacy cascades: {legacy_time:.3f}s ({len(frs) / legacy_time:,.0f} FRs/s)")
+    print(f"Compiled regex:  {compiled_time:.3f}s ({len(frs) / compiled_time:,.0f} FRs/s)")
+    print(f"Speedup: {legacy_time / compiled_time:.2f}x")
+    print(f"Mismatches: {mismatches}")
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: URL-shortener template, naive vs optimized.
+
+Generates both templates for the TinyURL FRs and reports short codes/sec
+from the optimized block allocator, shorten_url and resolve_url throughput,
+from one thread and from --threads threads at once. Every code handed out
+is checked for collisions, and re-shortening a URL from another thread
+must return its original code. The naive template scans all URLs per call,
+so it only gets --naive-count URLs.
+
+    python3 bench_shortener.py --count 1000000 --threads 8
+"""
+
+import argparse
+import threading
+import time
+import types
+from typing import Callable, List, Tuple
+
+from add_python_templates_simple import generate_python_template
+
+FRS = [
+    'Given a long URL, generate a short URL',
+    'Redirect users from short URL to original URL',
+]
+
+
+def load(optimized: bool) -> types.ModuleType:
+    module = types.ModuleType('shortener_optimized' if optimized else 'shortener_naive')
+    exec(generate_python_template('TinyURL', FRS, optimized=optimized), module.__dict__)
+    return module
+
+
+def run_threads(threads: int, count: int,
+                work: Callable[[int, int, list], None]) -> Tuple[List[list], float]:
+    """Run work(thread, count // threads, results) in `threads` threads: (per-thread results, seconds)."""
+    results = [[] for _ in range(threads)]
+    workers = [threading.Thread(target=work, args=(i, count // threads, results[i])) for i in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return results, time.perf_counter() - started
+
+
+def report(label: str, count: int, elapsed: float) -> None:
+    print(f"  {label:<40} {count / elapsed:>14,.0f} ops/s  ({count:,} in {elapsed:.2f}s)")
+
+
+def bench_codes(threads: int, count: int) -> int:
+    """Codes/sec of the allocator alone; returns the number of collisions."""
+    module = load(optimized=True)
+    next_code = module._next_code
+
+    def work(_, calls, codes):
+        codes.extend(next_code() for _ in range(calls))
+
+    results, elapsed = run_threads(threads, count, work)
+    codes = [code for codes in results for code in codes]
+    report(f"_next_code (threads={threads})", len(codes), elapsed)
+    return len(codes) - len(set(codes))
+
+
+def bench_shorten(module: types.ModuleType, threads: int, count: int, label: str) -> int:
+    """shorten_url/resolve_url throughput; returns the number of collisions and dedupe failures."""
+    def shorten(thread, calls, codes):
+        codes.extend(module.shorten_url(f'https://example.com/{thread}/{i}')['code'] for i in range(calls))
+
+    results, elapsed = run_threads(threads, count, shorten)
+    codes = [code for codes in results for code in codes]
+    report(f"{label} shorten_url (threads={threads})", len(codes), elapsed)
+    failures = len(codes) - len(set(codes))
+
+    # Each thread re-shortens the previous thread's URLs: the codes must not change
+    def reshorten(thread, calls, mismatches):
+        source = (thread - 1) % threads
+        for i, code in enumerate(results[source]):
+            if module.shorten_url(f'https://example.com/{source}/{i}')['code'] != code:
+                mismatches.append(code)
+
+    mismatches, elapsed = run_threads(threads, len(codes), reshorten)
+    report(f"{label} shorten_url, known URL", len(codes), elapsed)
+    failures += sum(len(thread_mismatches) for thread_mismatches in mismatches)
+
+    started = time.perf_counter()
+    resolved = sum(1 for code in codes if module.resolve_url(code) is not None)
+    report(f"{label} resolve_url", len(codes), time.perf_counter() - started)
+    return failures + len(codes) - resolved
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=1000000, help="Codes/URLs per optimized run")
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--naive-count', type=int, default=5000, help="URLs for the naive template")
+    args = parser.parse_args()
+
+    failures = 0
+    print("Optimized template:")
+    for threads in sorted({1, args.threads}):
+        failures += bench_codes(threads, args.count)
+    for threads in sorted({1, args.threads}):
+        failures += bench_shorten(load(optimized=True), threads, args.count, 'optimized')
+
+    print("Naive template:")
+    failures += bench_shorten(load(optimized=False), 1, args.naive_count, 'naive')
+
+    print(f"Collisions and dedupe failures: {failures}")
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: per-function scaling of generated Python templates.
+
+Loads each template, fills its storage to every requested size and times
+each top-level function: ops/sec, p50/p99 latency and the peak memory one
+call allocates (tracemalloc). Storage is filled through the template's
+own writer functions (create_*, add_*, send_*, ...) so any indexes they
+maintain stay consistent; dicts no writer fills get generic records.
+
+    python3 bench_templates.py test_user_code.py --sizes 1000,10000,100000
+    python3 bench_templates.py --problem tinyUrlProblemDefinition --json base.json
+    python3 bench_templates.py --problem tinyUrlProblemDefinition --compare base.json
+    python3 bench_templates.py --fr 'Create items' --fr 'Search items' --json naive.json
+    python3 bench_templates.py --fr 'Create items' --fr 'Search items' --optimized --compare naive.json
+    python3 bench_templates.py --fr 'Cache responses' --optimized --key-skew 1.1
+
+--compare reports each function's ops/sec against an earlier --json run
+(e.g. the naive template vs an optimized variant) and exits non-zero on
+regressions beyond --threshold. --key-skew draws `key` arguments from a
+Zipf distribution over `size` keys, for writers and readers alike, so
+caches see a realistic hot set instead of every key once.
+"""
+
+import argparse
+import csv
+import gc
+import hashlib
+import inspect
+import json
+import os
+import platform
+import random
+import re
+import sys
+import time
+import tracemalloc
+import types
+import typing
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Tuple
+
+from definition_index import escape_template, index_definitions, unescape_template
+from smoke_templates import sample_value
+from template_pipeline import PipelineDefinition, definition_files
+
+DEFINITIONS_DIR = "/Users/ankurkothari/Documents/workspace/idlecampus/frontend/src/apps/system-design/builder/challenges/definitions/generated-all"
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+# Functions that add records; they fill the storage before the readers are timed
+WRITER_PREFIXES = (
+    'create_', 'add_', 'send_', 'track_', 'store_', 'save_', 'register_', 'upload_',
+    'insert_', 'write_', 'follow_', 'cache_', 'record_', 'publish_', 'post_', 'process_',
+)
+
+# Words every synthesized `content` contains, so searches have matches
+QUERY = 'word7'
+EVENT_TYPES = ['view', 'click', 'share', 'like']
+NOW = datetime(2025, 1, 1)
+
+CSV_FIELDS = ['template', 'function', 'size', 'iterations', 'ops_per_sec',
+              'p50_us', 'p99_us', 'peak_kib', 'error']
+
+
+# Id stems naming a user in a particular role
+USER_ROLES = {'follower', 'followee', 'author', 'sender', 'recipient', 'friend'}
+
+
+def id_stem(parameter: str) -> str:
+    """`user1_id` -> 'user': ids of the same stem refer to the same records."""
+    stem = re.sub(r'\d+$', '', parameter[:-len('_id')])
+    return 'user' if stem in USER_ROLES else stem
+
+
+def is_writer(name: str) -> bool:
+    return name.startswith(WRITER_PREFIXES)
+
+
+def public_functions(module: types.ModuleType) -> List[Callable]:
+    return [
+        value for name, value in module.__dict__.items()
+        if inspect.isfunction(value) and not name.startswith('_')
+        and value.__module__ in (module.__name__, 'template_runtime')
+    ]
+
+
+class ArgumentFactory:
+    """
+    Arguments for template functions against storage of `size` records.
+    The first `*_id` parameter of a writer takes a new id per call; other
+    ids are drawn from a pool of size/100 so there are ~100 records per
+    user, listing, conversation, ...
+    With key_skew, `key` arguments follow a Zipf distribution with that
+    exponent over `size` keys instead of being new for every call.
+    """
+
+    # Zipf-distributed keys drawn up front and cycled through
+    KEY_SAMPLES = 1 << 16
+
+    def __init__(self, size: int, key_skew: float = 0.0):
+        self.size = size
+        self.pool = max(10, size // 100)
+        self.key_skew = key_skew
+        self._keys = None
+        if key_skew:
+            weights = [1 / (rank + 1) ** key_skew for rank in range(size)]
+            # Seeded per size, so runs compared with --compare see the same keys
+            self._keys = random.Random(size).choices(range(size), weights=weights, k=self.KEY_SAMPLES)
+        # Introspection is far slower than the calls being filled with
+        self._signatures = {}
+        self._takes_kwargs = {}
+
+    def _parameters(self, function) -> List[Tuple[str, Any]]:
+        """(name, annotation) of the parameters without defaults."""
+        if function not in self._signatures:
+            try:
+                hints = typing.get_type_hints(function)
+            except Exception:
+                hints = getattr(function, '__annotations__', {})
+            parameters = inspect.signature(function).parameters.values()
+            self._takes_kwargs[function] = any(p.kind is p.VAR_KEYWORD for p in parameters)
+            self._signatures[function] = [
+                (parameter.name, hints.get(parameter.name, parameter.empty))
+                for parameter in parameters
+                if parameter.default is parameter.empty and parameter.kind not in (
+                    parameter.VAR_POSITIONAL, parameter.VAR_KEYWORD, parameter.POSITIONAL_ONLY)
+            ]
+        return self._signatures[function]
+
+    def _value(self, name: str, annotation: Any, i: int, primary: bool) -> Any:
+        if name.endswith('_id'):
+            number = i if primary else (i % self.pool)
+            return f'{id_stem(name)}_{number}'
+        if name in ('content', 'text', 'body', 'message', 'title', 'description'):
+            return f'lorem ipsum word{i % 97} record {i}'
+        if name in ('query', 'term', 'keyword', 'q'):
+            return QUERY
+        if name in ('event_type', 'type', 'reaction_type'):
+            return EVENT_TYPES[i % len(EVENT_TYPES)]
+        if name in ('key',):
+            return f'key_{self._keys[i % self.KEY_SAMPLES] if self._keys else i}'
+        if name in ('value', 'amount', 'score', 'price'):
+            return float(i % 100)
+        return sample_value(annotation)
+
+    def writer_arguments(self, function, i: int) -> Dict[str, Any]:
+        """Arguments for the `i`th call of a writer: a new primary id each time."""
+        arguments = {}
+        primary = True
+        for name, annotation in self._parameters(function):
+            arguments[name] = self._value(name, annotation, i, primary and name.endswith('_id'))
+            if name.endswith('_id'):
+                primary = False
+        if self._takes_kwargs[function] and 'content' not in arguments:
+            # Records stored through **kwargs get some text too, so searches have matches
+            arguments['content'] = self._value('content', str, i, False)
+        return arguments
+
+    def reader_arguments(self, function, i: int = 1) -> Dict[str, Any]:
+        """
+        Arguments for a reader: ids of records that exist (1, 2, ... per
+        parameter). Only skewed keys depend on the call number `i`.
+        """
+        arguments = {}
+        id_params = 0
+        for name, annotation in self._parameters(function):
+            if name.endswith('_id'):
+                id_params += 1
+                arguments[name] = f'{id_stem(name)}_{id_params}'
+            else:
+                arguments[name] = self._value(name, annotation, i if name == 'key' else 1, False)
+        return arguments
+
+    def varies_per_call(self, function) -> bool:
+        """Whether a reader's arguments differ between calls (skewed keys)."""
+        return self._keys is not None and any(name == 'key' for name, _ in self._parameters(function))
+
+
+def generic_record(name: str, i: int, pool: int) -> Dict[str, Any]:
+    return {
+        'id': f'{name}_{i}',
+        'user_id': f'user_{i % pool}',
+        'item_id': f'item_{i % pool}',
+        'content': f'lorem ipsum word{i % 97} record {i}',
+        'type': EVENT_TYPES[i % len(EVENT_TYPES)],
+        'value': float(i % 100),
+        'status': 'active',
+        'created_at': NOW,
+        'expires_at': NOW.timestamp() + 10 ** 9,
+        'metadata': {},
+    }
+
+
+def load_template(name: str, source: str) -> types.ModuleType:
+    """Execute the template as a fresh module (with a fresh shared runtime)."""
+    sys.modules.pop('template_runtime', None)
+    module = types.ModuleType(f'template_{name}')
+    exec(compile(source, f'<{name}.pythonTemplate>', 'exec'), module.__dict__)
+    return module
+
+
+def fill_storage(module: types.ModuleType, size: int, factory: ArgumentFactory) -> List[str]:
+    """Fill the template's storage to `size` records. Returns the writers that failed."""
+    failed = []
+    for function in public_functions(module):
+        if not is_writer(function.__name__):
+            continue
+        try:
+            for i in range(size):
+                function(**factory.writer_arguments(function, i))
+        except Exception:
+            failed.append(function.__name__)
+
+    for name, value in list(module.__dict__.items()):
+        if isinstance(value, dict) and not value and not name.startswith('_'):
+            # Storage no writer fills (e.g. `users` read by placeholder functions)
+            value.update((f'{name}_{i}', generic_record(name, i, factory.pool)) for i in range(size))
+    return failed
+
+
+def percentile(sorted_values: List[int], fraction: float) -> float:
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def bench_function(function, arguments: Callable[[int], Dict[str, Any]],
+                   min_time: float, min_iterations: int, max_iterations: int) -> Dict[str, Any]:
+    """Time calls until both min_time and min_iterations are reached."""
+    function(**arguments(0))  # warm-up
+    latencies = []
+    started = time.perf_counter()
+    i = 1
+    while i <= max_iterations:
+        call_arguments = arguments(i)
+        call_start = time.perf_counter_ns()
+        function(**call_arguments)
+        latencies.append(time.perf_counter_ns() - call_start)
+        i += 1
+        if len(latencies) >= min_iterations and time.perf_counter() - started >= min_time:
+            break
+    total_ns = sum(latencies)
+
+    # One more call under tracemalloc for its peak allocation
+    call_arguments = arguments(i)
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+        function(**call_arguments)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        'iterations': len(latencies),
+        'ops_per_sec': round(len(latencies) / (total_ns / 1e9), 1) if total_ns else None,
+        'p50_us': round(percentile(latencies, 0.50) / 1000, 3),
+        'p99_us': round(percentile(latencies, 0.99) / 1000, 3),
+        'peak_kib': round((peak - baseline) / 1024, 2),
+    }
+
+
+def bench_template(name: str, source: str, sizes: List[int], args) -> List[Dict[str, Any]]:
+    rows = []
+    for size in sizes:
+        module = load_template(name, source)
+        factory = ArgumentFactory(size, args.key_skew)
+        fill_started = time.perf_counter()
+        failed_writers = fill_storage(module, size, factory)
+        # The prefilled records are long-lived: keep full GC passes over them out of the timings
+        gc.collect()
+        gc.freeze()
+        print(f"→ {name} @ {size:,}: storage filled in {time.perf_counter() - fill_started:.2f}s")
+
+        # Readers first: timing a writer adds records, which would skew the readers' size
+        functions = sorted(public_functions(module), key=lambda f: is_writer(f.__name__))
+        for function in functions:
+            row = {'template': name, 'function': function.__name__, 'size': size}
+            if function.__name__ in failed_writers:
+                row['error'] = 'writer failed while filling storage'
+                rows.append(row)
+                continue
+            if is_writer(function.__name__):
+                # New records each call, numbered after the ones already stored
+                make_arguments = lambda i, f=function: factory.writer_arguments(f, size + i)
+            elif factory.varies_per_call(function):
+                make_arguments = lambda i, f=function: factory.reader_arguments(f, i)
+            else:
+                reader_arguments = factory.reader_arguments(function)
+                make_arguments = lambda i, a=reader_arguments: a
+            try:
+                row.update(bench_function(function, make_arguments, args.min_time,
+                                          args.min_iterations, args.max_iterations))
+            except Exception as e:
+                row['error'] = f'{type(e).__name__}: {e}'
+            rows.append(row)
+            if 'error' in row:
+                print(f"  ✗ {row['function']}: {row['error']}")
+            else:
+                print(f"  {row['function']:<40} {row['ops_per_sec']:>12,.0f} ops/s"
+                      f"  p50 {row['p50_us']:>10,.1f}µs  p99 {row['p99_us']:>10,.1f}µs"
+                      f"  peak {row['peak_kib']:>8,.1f}KiB")
+        # Release this size's records before filling the next one
+        gc.unfreeze()
+    return rows
+
+
+def definition_templates(problems: List[str]) -> List[Tuple[str, str]]:
+    """(problem, Python source) for the named problems in the definitions directory."""
+    wanted = set(problems)
+    found = {}
+    for filepath in definition_files(DEFINITIONS_DIR):
+        with open(filepath, 'r') as f:
+            content = f.read()
+        for entry in index_definitions(content):
+            if entry.name not in wanted:
+                continue
+            definition = PipelineDefinition(entry, content[entry.start:entry.end],
+                                            directory=os.path.dirname(filepath))
+            if definition.template is not None:
+                found[entry.name] = unescape_template(definition.template)
+    missing = [problem for problem in problems if problem not in found]
+    if missing:
+        raise SystemExit(f"✗ No template found for: {', '.join(missing)}")
+    return [(problem, found[problem]) for problem in problems]
+
+
+def generated_template(frs: List[str], optimized: bool) -> Tuple[str, str]:
+    """(name, Python source) of the rule-generated template for `frs`, storage fixed."""
+    from add_python_templates_simple import generate_python_template
+    from fix_storage_references import fix_template
+
+    source = generate_python_template('benchmark', frs, optimized=optimized)
+    # Naive templates may use storage no FR declared; the fix pass adds it.
+    # It works on escaped pythonTemplate bodies, so round-trip the source.
+    fixed = fix_template(escape_template(source))
+    if fixed is not None:
+        source = unescape_template(fixed)
+    return ('generated_optimized' if optimized else 'generated_naive'), source
+
+
+def compare(rows: List[Dict[str, Any]], baseline_path: str, threshold: float) -> int:
+    """Print ops/sec against a baseline run. Returns the number of regressions."""
+    with open(baseline_path, 'r') as f:
+        baseline = json.load(f)
+    # Matched by function and size, so a variant can be compared against the naive template
+    old = {(row['function'], row['size']): row for row in baseline['results'] if row.get('ops_per_sec')}
+    regressions = 0
+    print(f"\nComparison with {baseline_path}:")
+    for row in rows:
+        before = old.get((row['function'], row['size']))
+        if before is None or not row.get('ops_per_sec'):
+            continue
+        ratio = row['ops_per_sec'] / before['ops_per_sec']
+        marker = '✗' if ratio < 1 - threshold else ('✓' if ratio > 1 + threshold else '=')
+        regressions += marker == '✗'
+        print(f"  {marker} {row['function']:<40} @ {row['size']:>9,}: {ratio:8.2f}x "
+              f"({before['ops_per_sec']:,.0f} → {row['ops_per_sec']:,.0f} ops/s)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='*', metavar='FILE', help="Python template files to benchmark")
+    parser.add_argument('--problem', action='append', default=[],
+                        help="Benchmark the template of this problem definition (repeatable)")
+    parser.add_argument('--fr', action='append', default=[],
+                        help="Benchmark the template the rule generator emits for these FRs (repeatable)")
+    parser.add_argument('--optimized', action='store_true',
+                        help="With --fr, generate the optimized variant")
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES),
+                        help="Comma-separated storage sizes (default: %(default)s)")
+    parser.add_argument('--key-skew', type=float, default=0.0, metavar='S',
+                        help="Draw `key` arguments from a Zipf distribution with exponent S over `size` keys "
+                             "(e.g. 1.1; default: every key once)")
+    parser.add_argument('--min-time', type=float, default=0.2,
+                        help="Seconds to time each function per size")
+    parser.add_argument('--min-iterations', type=int, default=5)
+    parser.add_argument('--max-iterations', type=int, default=100000)
+    parser.add_argument('--json', metavar='PATH', help="Write the results as JSON")
+    parser.add_argument('--csv', metavar='PATH', help="Write the results as CSV")
+    parser.add_argument('--compare', metavar='PATH', help="Compare against an earlier --json run")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="Relative ops/sec drop reported as a regression (default: %(default)s)")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    templates = []
+    for path in args.files:
+        with open(path, 'r') as f:
+            templates.append((os.path.splitext(os.path.basename(path))[0], f.read()))
+    templates += definition_templates(args.problem) if args.problem else []
+    if args.fr:
+        templates.append(generated_template(args.fr, args.optimized))
+    if not templates:
+        parser.error("give template files or --problem")
+
+    rows = []
+    for name, source in templates:
+        rows += bench_template(name, source, sizes, args)
+
+    result = {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sizes': sizes,
+        'templates': {name: hashlib.sha256(source.encode('utf-8')).hexdigest() for name, source in templates},
+        'results': rows,
+    }
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"\nResults written to {args.json}")
+    if args.csv:
+        with open(args.csv, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"Results written to {args.csv}")
+
+    if args.compare and compare(rows, args.compare, args.threshold):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
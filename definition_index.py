@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Single-pass indexer for ProblemDefinition modules.
+
+Scans a `*AllProblems.ts` file once and returns a compact index of every
+`export const xxxProblemDefinition: ProblemDefinition = {...};` block: its name,
+span, title, userFacingFRs and pythonTemplate location. The lexer understands
+string literals with escaped quotes, line/block comments and template literals
+with (nested) `${...}` interpolations, so braces inside any of those never
+confuse the definition boundaries.
+"""
+
+import re
+from typing import List, NamedTuple, Optional, Tuple
+
+# One token per match; anything not matched here is plain code we can skip
+CODE_TOKEN = re.compile(r"""
+    (?P<header>export\s+const\s+(?P<name>\w+ProblemDefinition)\s*:\s*ProblemDefinition\s*=\s*\{)
+  | (?P<loader>\bpythonTemplateLoader\s*:\s*\(\s*\)\s*=>\s*import\(\s*(?P<asset>'[^'\\\n]*'|"[^"\\\n]*")\s*\))
+  | (?P<key>\b(?P<keyname>title|userFacingFRs|pythonTemplate)\s*:)
+  | (?P<line_comment>//[^\n]*)
+  | (?P<block_comment>/\*.*?(?:\*/|\Z))
+  | (?P<string>'(?:[^'\\\n]|\\.)*'|"(?:[^"\\\n]|\\.)*")
+  | (?P<backtick>`)
+  | (?P<open>[{\[(])
+  | (?P<close>[}\])])
+""", re.VERBOSE | re.DOTALL)
+
+# Body of a template literal up to the closing backtick or the next `${`
+TEMPLATE_CHUNK = re.compile(r'(?:[^`\\$]|\\.|\$(?!\{))*', re.DOTALL)
+
+STRING_ESCAPE = re.compile(r'\\(.)', re.DOTALL)
+STRING_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', '0': '\0'}
+
+
+class DefinitionEntry(NamedTuple):
+    """One ProblemDefinition found in a file."""
+    name: str
+    start: int
+    end: int
+    title: str
+    frs: Tuple[str, ...]
+    has_template: bool
+    # Span of the pythonTemplate literal body (between the backticks), if any
+    template_span: Optional[Tuple[int, int]]
+    # Import path of a lazily loaded template asset (pythonTemplateLoader), if any
+    template_asset: Optional[str] = None
+
+
+def unquote_string(literal: str) -> str:
+    """Decode a single- or double-quoted TS string literal (quotes included)."""
+    return STRING_ESCAPE.sub(lambda m: STRING_ESCAPES.get(m.group(1), m.group(1)), literal[1:-1])
+
+
+def escape_template(code: str) -> str:
+    """Escape backslashes, backticks and `${` so `code` can sit in a template literal."""
+    return code.replace('\\', '\\\\').replace('`', '\\`').replace('${', '\\${')
+
+
+def unescape_template(body: str) -> str:
+    """Decode the body of a template literal without interpolations (backticks excluded)."""
+    return STRING_ESCAPE.sub(lambda m: STRING_ESCAPES.get(m.group(1), m.group(1)), body)
+
+
+class _Definition:
+    """Mutable accumulator for the definition currently being scanned."""
+
+    def __init__(self, name: str, start: int, depth: int):
+        self.name = name
+        self.start = start
+        self.depth = depth
+        self.title = None
+        self.frs = None
+        self.has_template = False
+        self.template_span = None
+        self.template_asset = None
+        # Indexed key whose value token comes next
+        self.pending_key = None
+        # Depth of the userFacingFRs array while we are collecting it
+        self.frs_depth = None
+
+    def entry(self, end: int) -> DefinitionEntry:
+        return DefinitionEntry(
+            name=self.name,
+            start=self.start,
+            end=end,
+            title=self.title if self.title is not None else "Unknown Problem",
+            frs=tuple(fr for fr in (self.frs or []) if fr.strip()),
+            has_template=self.has_template,
+            template_span=self.template_span,
+            template_asset=self.template_asset,
+        )
+
+
+def index_definitions(content: str) -> List[DefinitionEntry]:
+    """
+    Index every ProblemDefinition in `content` in a single linear pass.
+    Returns entries in source order. Spans are str offsets into `content`,
+    with `end` just past the terminating semicolon.
+    """
+    entries = []
+    current = None
+    depth = 0
+    # Depths at which `${` interpolations were opened, innermost last
+    interpolations = []
+    pos = 0
+    length = len(content)
+
+    while pos < length:
+        if interpolations and interpolations[-1] is None:
+            # Inside a template literal body
+            interpolations.pop()
+            chunk = TEMPLATE_CHUNK.match(content, pos)
+            pos = chunk.end()
+            if pos >= length:
+                break
+            if content[pos] == '`':
+                pos += 1
+                continue
+            # `${` opens an interpolation; resume the literal at its matching `}`
+            interpolations.append(depth)
+            depth += 1
+            pos += 2
+            continue
+
+        match = CODE_TOKEN.search(content, pos)
+        if not match:
+            break
+        pos = match.end()
+        kind = match.lastgroup
+
+        if kind == 'header' or kind == 'name':
+            if current is None and depth == 0 and not interpolations:
+                current = _Definition(match.group('name'), match.start(), depth)
+            depth += 1
+
+        elif kind == 'loader' or kind == 'asset':
+            if current is not None:
+                current.has_template = True
+                current.template_asset = unquote_string(match.group('asset'))
+            continue
+
+        elif kind == 'key' or kind == 'keyname':
+            if current is not None and current.pending_key is None:
+                current.pending_key = match.group('keyname')
+
+        elif kind in ('line_comment', 'block_comment'):
+            continue
+
+        elif kind == 'string':
+            if current is not None:
+                if current.frs_depth is not None and depth == current.frs_depth:
+                    current.frs.append(unquote_string(match.group()))
+                elif current.pending_key == 'title' and current.title is None:
+                    current.title = unquote_string(match.group())
+
+        elif kind == 'backtick':
+            literal_start = pos
+            chunk = TEMPLATE_CHUNK.match(content, pos)
+            pos = chunk.end()
+            if pos < length and content[pos] == '`':
+                # Plain literal without interpolations
+                if current is not None:
+                    _take_template_value(current, content, literal_start, pos, depth)
+                pos += 1
+            elif pos < length:
+                if current is not None:
+                    # Interpolated values are never simple titles/templates
+                    if current.pending_key == 'pythonTemplate':
+                        current.has_template = True
+                    current.pending_key = None
+                interpolations.append(depth)
+                depth += 1
+                pos += 2
+
+        elif kind == 'open':
+            if current is not None and current.pending_key:
+                if current.pending_key == 'userFacingFRs' and match.group() == '[' and current.frs is None:
+                    current.frs = []
+                    current.frs_depth = depth + 1
+                elif current.pending_key == 'pythonTemplate':
+                    current.has_template = True
+                current.pending_key = None
+            depth += 1
+
+        elif kind == 'close':
+            depth -= 1
+            if interpolations and interpolations[-1] == depth:
+                # End of a `${...}`: drop back into the template literal body
+                interpolations.pop()
+                interpolations.append(None)
+                continue
+            if current is None:
+                continue
+            if current.frs_depth is not None and depth < current.frs_depth:
+                current.frs_depth = None
+            if depth == current.depth and match.group() == '}':
+                semicolon_pos = content.find(';', match.start())
+                if semicolon_pos != -1:
+                    entries.append(current.entry(semicolon_pos + 1))
+                    pos = semicolon_pos + 1
+                current = None
+
+        # Whatever token followed a tracked key was its value
+        if current is not None and current.pending_key and kind not in ('key', 'keyname'):
+            if current.pending_key == 'pythonTemplate':
+                current.has_template = True
+            current.pending_key = None
+
+    return entries
+
+
+def _take_template_value(current: _Definition, content: str, start: int, end: int, depth: int) -> None:
+    """Record an interpolation-free template literal as a title or pythonTemplate value."""
+    key = current.pending_key
+    current.pending_key = None
+    if key == 'pythonTemplate':
+        current.has_template = True
+        current.template_span = (start, end)
+    elif key == 'title' and current.title is None:
+        current.title = content[start:end]
+    elif current.frs_depth is not None and depth == current.frs_depth:
+        current.frs.append(content[start:end])
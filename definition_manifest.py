@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Per-definition hash manifest for incremental regeneration.
+
+Stored next to the definitions as `.python-templates-manifest.json`. Each
+script records, under its own namespace, the state every file was in when
+it last finished with it: size/mtime, a content hash, a hash per
+ProblemDefinition, an optional result payload (e.g. per-file counts) and
+the size/mtime of files it depends on (template assets). On the next run,
+files whose size and mtime are unchanged are skipped without being read,
+files whose content hash matches are skipped without being lexed, and only
+definitions whose hash changed are reprocessed. A changed or missing
+dependency sends the file back through the pipeline.
+"""
+
+import hashlib
+import json
+import os
+from typing import Dict, Iterable, Optional
+
+from definition_index import DefinitionEntry
+
+MANIFEST_FILENAME = '.python-templates-manifest.json'
+MANIFEST_VERSION = 2
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def definition_hashes(content: str, problems: Iterable[DefinitionEntry],
+                      replacements: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """
+    Hash every definition by name. `replacements` maps names to the new
+    definition text for definitions that were rewritten after indexing.
+    """
+    replacements = replacements or {}
+    return {
+        problem.name: content_hash(replacements.get(problem.name, content[problem.start:problem.end]))
+        for problem in problems
+    }
+
+
+class DefinitionManifest:
+    """One script's view of the manifest in a definitions directory."""
+
+    def __init__(self, directory: str, namespace: str, enabled: bool = True):
+        self.path = os.path.join(directory, MANIFEST_FILENAME)
+        self.namespace = namespace
+        # When disabled nothing counts as unchanged, but results are still recorded
+        self.enabled = enabled
+        self.data = {'version': MANIFEST_VERSION, 'scripts': {}}
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as f:
+                try:
+                    data = json.load(f)
+                except ValueError:
+                    data = None
+            if isinstance(data, dict) and data.get('version') == MANIFEST_VERSION:
+                self.data = data
+        self.files = self.data['scripts'].setdefault(namespace, {})
+        self.dirty = False
+
+    def _entry(self, filepath: str) -> Optional[dict]:
+        return self.files.get(os.path.basename(filepath))
+
+    def is_unchanged(self, filepath: str) -> bool:
+        """
+        True if the file is exactly as this script last left it. Checks
+        size/mtime first and only reads and hashes the file when those differ.
+        """
+        entry = self._entry(filepath)
+        if not self.enabled or entry is None or entry['sha256'] is None:
+            return False
+        directory = os.path.dirname(filepath)
+        for relpath, (size, mtime_ns) in entry.get('dependencies', {}).items():
+            try:
+                stat = os.stat(os.path.join(directory, relpath))
+            except FileNotFoundError:
+                return False
+            if stat.st_size != size or stat.st_mtime_ns != mtime_ns:
+                return False
+        stat = os.stat(filepath)
+        if stat.st_size == entry['size'] and stat.st_mtime_ns == entry['mtime_ns']:
+            return True
+        with open(filepath, 'r') as f:
+            if content_hash(f.read()) != entry['sha256']:
+                return False
+        # Touched but not modified: refresh the stat fast path
+        entry['size'], entry['mtime_ns'] = stat.st_size, stat.st_mtime_ns
+        self.dirty = True
+        return True
+
+    def known_definitions(self, filepath: str) -> Dict[str, str]:
+        """Definition hashes recorded for the file by the last run."""
+        entry = self._entry(filepath)
+        if not self.enabled or entry is None:
+            return {}
+        return entry['definitions']
+
+    def result(self, filepath: str) -> Optional[dict]:
+        """The result payload recorded with the file, if any."""
+        entry = self._entry(filepath)
+        return entry.get('result') if entry is not None else None
+
+    def record(self, filepath: str, sha256: Optional[str], hashes: Dict[str, str],
+               result: Optional[dict] = None, dependencies: Iterable[str] = ()) -> None:
+        """
+        Remember `filepath` as it is now on disk. `sha256` is its content hash,
+        or None if the file must be revisited next run (e.g. after failures);
+        `hashes` holds only the definitions that are done. `dependencies` are
+        paths of other files whose changes should also invalidate it.
+        """
+        stat = os.stat(filepath)
+        directory = os.path.dirname(filepath)
+        dependency_stats = {}
+        for path in dependencies:
+            if os.path.exists(path):
+                dependency_stat = os.stat(path)
+                dependency_stats[os.path.relpath(path, directory)] = [
+                    dependency_stat.st_size, dependency_stat.st_mtime_ns,
+                ]
+        self.files[os.path.basename(filepath)] = {
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': sha256,
+            'definitions': hashes,
+            'result': result,
+            'dependencies': dependency_stats,
+        }
+        self.dirty = True
+
+    def save(self) -> None:
+        if not self.dirty:
+            return
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.data, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Edit journal for rewriting definition files.
+
+Stages record (span, replacement) edits against the original file content
+instead of splicing the whole string for every change. The journal is then
+applied in one linear join, or rendered as a unified diff for --dry-run.
+"""
+
+import difflib
+from typing import List, Tuple
+
+
+class EditJournal:
+    """Collects non-overlapping span replacements against a fixed text."""
+
+    def __init__(self, content: str):
+        self.content = content
+        self.edits: List[Tuple[int, int, str]] = []
+
+    def __len__(self) -> int:
+        return len(self.edits)
+
+    def replace(self, start: int, end: int, replacement: str) -> None:
+        """Replace content[start:end] with `replacement`."""
+        if not 0 <= start <= end <= len(self.content):
+            raise ValueError(f"Edit span ({start}, {end}) is outside the content")
+        self.edits.append((start, end, replacement))
+
+    def insert(self, pos: int, text: str) -> None:
+        """Insert `text` before content[pos]."""
+        self.replace(pos, pos, text)
+
+    def apply(self) -> str:
+        """Return the edited content, built with a single join."""
+        if not self.edits:
+            return self.content
+
+        pieces = []
+        last_end = 0
+        # Stable sort keeps insertions at the same position in record order
+        for start, end, replacement in sorted(self.edits, key=lambda edit: (edit[0], edit[1])):
+            if start < last_end:
+                raise ValueError(f"Edit at {start} overlaps a previous edit ending at {last_end}")
+            pieces.append(self.content[last_end:start])
+            pieces.append(replacement)
+            last_end = end
+        pieces.append(self.content[last_end:])
+        return ''.join(pieces)
+
+    def diff(self, filename: str) -> str:
+        """Unified diff between the original and edited content."""
+        return ''.join(difflib.unified_diff(
+            self.content.splitlines(keepends=True),
+            self.apply().splitlines(keepends=True),
+            fromfile=f"a/{filename}",
+            tofile=f"b/{filename}",
+        ))
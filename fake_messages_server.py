@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Messages API, for measuring generation throughput offline.
+
+Serves POST /v1/messages with a canned Python template after a configurable
+latency. Injects 429/529 responses at a configurable rate so the backoff path
+gets exercised, and empty replies (no content blocks) so the per-prompt error
+path does. With --bench it also drives async_generation against itself and
+reports requests/sec.
+
+    python3 fake_messages_server.py --port 8765
+    python3 fake_messages_server.py --bench 500 --concurrency 32 --latency 0.2
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CANNED_TEMPLATE = '''```python
+from datetime import datetime
+from typing import List, Dict
+
+# In-memory storage (naive implementation)
+items = {}
+
+def create_item(item_id: str, **kwargs) -> Dict:
+    """
+    FR-1: Create an item
+    Naive implementation - stores item in memory
+    """
+    items[item_id] = {'id': item_id, 'created_at': datetime.now(), **kwargs}
+    return items[item_id]
+```'''
+
+
+class FakeMessagesHandler(BaseHTTPRequestHandler):
+    """Answers /v1/messages like the real API, minus the model."""
+
+    # Keep-alive, so clients can pool connections
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        length = int(self.headers.get('content-length', 0))
+        request = json.loads(self.rfile.read(length) or b'{}')
+        server = self.server
+
+        with server.lock:
+            server.request_count += 1
+
+        if self.path.rstrip('/') != '/v1/messages':
+            self._send(404, {'type': 'error', 'error': {'type': 'not_found_error', 'message': self.path}})
+            return
+
+        if random.random() < server.error_rate:
+            status = random.choice([429, 529])
+            with server.lock:
+                server.error_count += 1
+            self._send(status, {'type': 'error', 'error': {'type': 'rate_limit_error', 'message': 'injected'}},
+                       headers={'retry-after': '0'})
+            return
+
+        time.sleep(server.latency)
+        # An answer with no content blocks at all, which the client must not choke on
+        empty = random.random() < server.empty_rate
+        if empty:
+            with server.lock:
+                server.empty_count += 1
+        prompt = ''.join(m.get('content', '') for m in request.get('messages', []) if isinstance(m.get('content'), str))
+        self._send(200, {
+            'id': f"msg_fake_{server.request_count}",
+            'type': 'message',
+            'role': 'assistant',
+            'model': request.get('model', 'fake'),
+            'content': [] if empty else [{'type': 'text', 'text': CANNED_TEMPLATE}],
+            'stop_reason': 'end_turn',
+            'stop_sequence': None,
+            'usage': {'input_tokens': len(prompt) // 4, 'output_tokens': 0 if empty else len(CANNED_TEMPLATE) // 4},
+        })
+
+    def _send(self, status, body, headers=None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('content-type', 'application/json')
+        self.send_header('content-length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(port: int = 0, latency: float = 0.05, error_rate: float = 0.0,
+                 empty_rate: float = 0.0) -> ThreadingHTTPServer:
+    """Start the fake server on a background thread and return it."""
+    server = ThreadingHTTPServer(('127.0.0.1', port), FakeMessagesHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.error_rate = error_rate
+    server.empty_rate = empty_rate
+    server.lock = threading.Lock()
+    server.request_count = 0
+    server.error_count = 0
+    server.empty_count = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def run_bench(base_url: str, count: int, settings_kwargs: dict):
+    from async_generation import GenerationEngine, GenerationSettings
+
+    settings = GenerationSettings(base_url=base_url, **settings_kwargs)
+    prompts = [f"Generate template #{i}" for i in range(count)]
+    async with GenerationEngine(settings) as engine:
+        started = time.perf_counter()
+        results = await engine.generate(prompts)
+        elapsed = time.perf_counter() - started
+    return results, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.05, help="Seconds per successful response")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests answered with 429/529")
+    parser.add_argument('--empty-rate', type=float, default=0.0,
+                        help="Fraction of successful responses with an empty content list")
+    parser.add_argument('--bench', type=int, default=0, metavar='N', help="Send N requests through async_generation and exit")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--rpm', type=float, default=0, help="Requests/min limit for the bench (0 = unlimited)")
+    parser.add_argument('--tpm', type=float, default=0, help="Tokens/min limit for the bench (0 = unlimited)")
+    args = parser.parse_args()
+
+    server = start_server(0 if args.bench else args.port, args.latency, args.error_rate, args.empty_rate)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    if not args.bench:
+        print(f"Fake Messages API listening on {base_url}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+        return
+
+    os.environ.setdefault('ANTHROPIC_API_KEY', 'fake-key')
+    results, elapsed = asyncio.run(run_bench(base_url, args.bench, {
+        'concurrency': args.concurrency,
+        'requests_per_minute': args.rpm,
+        'tokens_per_minute': args.tpm,
+        'backoff_base': 0.05,
+    }))
+
+    ok = sum(1 for r in results if r.error is None)
+    retries = sum(r.attempts - 1 for r in results)
+    print(f"Requests: {len(results)} ({ok} ok, {len(results) - ok} failed, {retries} retries)")
+    print(f"Server saw: {server.request_count} requests, {server.error_count} injected errors, "
+          f"{server.empty_count} empty responses")
+    print(f"Elapsed: {elapsed:.2f}s")
+    print(f"Throughput: {len(results) / elapsed:.1f} req/s")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -4,114 +4,265 @@ Fix script to ensure all storage references are properly declared.
 Adds missing storage variables when functions reference them.
 """
 
-import re
+import argparse
+import ast
+import builtins
 import os
+from typing import Dict, List, Optional, Set, Tuple
+
+from definition_index import unescape_template
+from definition_manifest import content_hash
+from template_pipeline import Pipeline, Stage, definition_files
 
 DEFINITIONS_DIR = "/Users/ankurkothari/Documents/workspace/idlecampus/frontend/src/apps/system-design/builder/challenges/definitions/generated-all"
 
-def fix_file(filepath):
-    """Fix storage references in a file."""
-    filename = os.path.basename(filepath)
+STORAGE_HEADER = "# In-memory storage (naive implementation)"
+# Optimized templates drop the "(naive implementation)" suffix
+STORAGE_HEADER_PREFIX = "# In-memory storage"
 
-    with open(filepath, 'r') as f:
-        content = f.read()
+# Methods that mark the receiver as a storage container
+CONTAINER_METHODS = frozenset({
+    'get', 'keys', 'values', 'items', 'pop', 'setdefault', 'update', 'append', 'add', 'clear',
+})
 
-    fixed_count = 0
+BUILTIN_NAMES = frozenset(dir(builtins))
 
-    # Find all pythonTemplate blocks
-    pattern = r'pythonTemplate: `(.*?)`,'
+# Nodes that open a new scope
+SCOPE_NODES = (
+    ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef,
+    ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp,
+)
 
-    def fix_template(match):
-        nonlocal fixed_count
-        template = match.group(1)
+# Fix results by template hash: (fixed template or None, error message or None).
+# Generated templates repeat a lot, so most templates are analysed only once.
+_FIX_CACHE: Dict[str, Tuple[Optional[str], Optional[str]]] = {}
 
-        # Extract storage section
-        storage_match = re.search(r'# In-memory storage.*?\n(.*?)\n\ndef', template, re.DOTALL)
-        if not storage_match:
-            return match.group(0)
+# Child fields worth descending into, per node type (contexts and operators never matter)
+_CHILD_FIELDS: Dict[type, Tuple[str, ...]] = {}
 
-        storage_section = storage_match.group(1)
+def _children(node: ast.AST) -> List[ast.AST]:
+    node_type = type(node)
+    fields = _CHILD_FIELDS.get(node_type)
+    if fields is None:
+        fields = _CHILD_FIELDS[node_type] = tuple(
+            field for field in node_type._fields if field not in ('ctx', 'op', 'ops')
+        )
+    children = []
+    for field in fields:
+        value = getattr(node, field, None)
+        if isinstance(value, list):
+            children.extend(item for item in value if isinstance(item, ast.AST))
+        elif isinstance(value, ast.AST):
+            children.append(value)
+    return children
 
-        # Find all storage variables referenced in functions
-        referenced_vars = set()
+def _scan_scope(scope: ast.AST) -> Tuple[Set[str], List[str], List[ast.AST]]:
+    """
+    One pass over the nodes of `scope`: the names it binds locally, the bare
+    names it uses as containers (x[...], x.get(...), ... in x, for ... in x)
+    and the nested scopes, which are collected but not entered.
+    """
+    bound = set()
+    declared_global = set()
+    uses = []
+    nested = []
 
-        # Look for patterns like: items[...], items.get(...), item_id in items
-        for var_match in re.finditer(r'\b(\w+)\[', template):
-            var = var_match.group(1)
-            if var not in ['datetime', 'kwargs', 'Dict', 'List', 'str', 'int', 'float', 'bool']:
-                referenced_vars.add(var)
+    if isinstance(scope, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)):
+        arguments = scope.args
+        for arg in arguments.posonlyargs + arguments.args + arguments.kwonlyargs:
+            bound.add(arg.arg)
+        for arg in (arguments.vararg, arguments.kwarg):
+            if arg is not None:
+                bound.add(arg.arg)
 
-        for var_match in re.finditer(r'\b(\w+)\.get\(', template):
-            var = var_match.group(1)
-            if var not in ['datetime', 'kwargs', 'Dict', 'List', 'str', 'int', 'float', 'bool']:
-                referenced_vars.add(var)
+    stack = _children(scope)
+    while stack:
+        node = stack.pop()
+        if isinstance(node, SCOPE_NODES):
+            nested.append(node)
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                bound.add(node.name)
+            continue
 
-        for var_match in re.finditer(r'\bin (\w+)\b', template):
-            var = var_match.group(1)
-            if var not in ['datetime', 'kwargs', 'Dict', 'List', 'str', 'int', 'float', 'bool', 'range']:
-                referenced_vars.add(var)
+        if isinstance(node, ast.Name):
+            if not isinstance(node.ctx, ast.Load):
+                bound.add(node.id)
+        elif isinstance(node, ast.Subscript):
+            if isinstance(node.value, ast.Name):
+                uses.append(node.value.id)
+        elif isinstance(node, ast.Call):
+            func = node.func
+            if (isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name)
+                    and func.attr in CONTAINER_METHODS):
+                uses.append(func.value.id)
+        elif isinstance(node, ast.Compare):
+            for op, comparator in zip(node.ops, node.comparators):
+                if isinstance(op, (ast.In, ast.NotIn)) and isinstance(comparator, ast.Name):
+                    uses.append(comparator.id)
+        elif isinstance(node, (ast.For, ast.AsyncFor, ast.comprehension)):
+            if isinstance(node.iter, ast.Name):
+                uses.append(node.iter.id)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                bound.add(alias.asname or alias.name.split('.')[0])
+        elif isinstance(node, ast.ExceptHandler):
+            if node.name:
+                bound.add(node.name)
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            declared_global.update(node.names)
 
-        # Find currently declared storage variables
-        declared_vars = set()
-        for var_match in re.finditer(r'^(\w+) = \{\}', storage_section, re.MULTILINE):
-            declared_vars.add(var_match.group(1))
+        stack.extend(_children(node))
 
-        # Find missing variables
-        missing_vars = referenced_vars - declared_vars
+    return bound - declared_global, uses, nested
 
-        if missing_vars:
-            # Add missing variables to storage section
-            new_storage_lines = []
-            for var in sorted(declared_vars):
-                new_storage_lines.append(f'{var} = {{}}')
-            for var in sorted(missing_vars):
-                new_storage_lines.append(f'{var} = {{}}')
+def free_container_names(tree: ast.Module) -> Set[str]:
+    """Names used as containers that no enclosing scope binds (builtins included)."""
+    free = set()
+    # (scope, bound names of the enclosing function scopes and the module)
+    pending = [(tree, [])]
+    while pending:
+        scope, enclosing = pending.pop()
+        bound, uses, nested = _scan_scope(scope)
+        chain = enclosing + [bound]
+        for name in uses:
+            if not any(name in names for names in chain):
+                free.add(name)
+        # Class bodies are not visible from the functions inside them
+        inner = enclosing if isinstance(scope, ast.ClassDef) else chain
+        pending.extend((child, inner) for child in nested)
+    return free
 
-            new_storage = '\\n'.join(new_storage_lines)
+def _is_storage_declaration(node: ast.AST) -> bool:
+    return isinstance(node, ast.Assign) and isinstance(node.value, ast.Dict)
 
-            # Replace storage section
-            new_template = re.sub(
-                r'(# In-memory storage.*?\n)(.*?)(\n\ndef)',
-                r'\1' + new_storage + r'\3',
-                template,
-                count=1,
-                flags=re.DOTALL
-            )
+def _insert_declarations(template: str, tree: ast.Module, missing: Set[str]) -> str:
+    """
+    Insert `name = {}` lines after the module's storage (or imports).
+    With a storage header, they go after the declarations right below it, so
+    later blocks (e.g. the index storage of optimized templates) stay intact.
+    """
+    lines = template.split('\n')
+    declarations = [f'{var} = {{}}' for var in sorted(missing)]
 
-            fixed_count += 1
-            return f'pythonTemplate: `{new_template}`,'
+    header = next((number for number, line in enumerate(lines, 1)
+                   if line.startswith(STORAGE_HEADER_PREFIX)), None)
+    storage = [node for node in tree.body if _is_storage_declaration(node)]
+    if header is not None:
+        at = header
+        for node in tree.body:
+            if node.lineno <= header:
+                continue
+            if not _is_storage_declaration(node):
+                break
+            at = node.end_lineno
+    elif storage:
+        at = storage[-1].end_lineno
+    else:
+        # No storage section yet: start one after the imports / docstring
+        preamble = [node for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+        if not preamble and tree.body and isinstance(tree.body[0], ast.Expr) \
+                and isinstance(tree.body[0].value, ast.Constant):
+            preamble = [tree.body[0]]
+        at = preamble[-1].end_lineno if preamble else 0
+        declarations = [STORAGE_HEADER] + declarations + ['']
+        if at:
+            declarations.insert(0, '')
 
-        return match.group(0)
+    lines[at:at] = declarations
+    return '\n'.join(lines)
 
-    new_content = re.sub(pattern, fix_template, content, flags=re.DOTALL)
+def _fix_template(template):
+    tree = ast.parse(unescape_template(template))
+    missing = free_container_names(tree) - BUILTIN_NAMES
+    if not missing:
+        return None
+    # Only whole lines are inserted, so the escaped template can be edited directly
+    return _insert_declarations(template, tree, missing)
 
-    if new_content != content:
-        with open(filepath, 'w') as f:
-            f.write(new_content)
-        print(f"✓ {filename}: Fixed {fixed_count} templates")
-        return True
-    else:
-        print(f"- {filename}: No fixes needed")
-        return False
+def fix_template(template):
+    """
+    Return `template` (an escaped pythonTemplate body) with any missing
+    storage declarations added, or None if it needs no fix.
+    Raises SyntaxError if the template does not parse.
+    """
+    key = content_hash(template)
+    if key not in _FIX_CACHE:
+        try:
+            _FIX_CACHE[key] = (_fix_template(template), None)
+        except SyntaxError as e:
+            _FIX_CACHE[key] = (None, f"line {e.lineno}: {e.msg}")
+    fixed, error = _FIX_CACHE[key]
+    if error is not None:
+        raise SyntaxError(error)
+    return fixed
+
+class StorageFixStage(Stage):
+    """Pipeline stage declaring storage that templates use but never define."""
+    name = 'fix_storage'
+
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+
+    def process(self, file):
+        """Fix storage references in a file's templates."""
+        stats = {'filename': file.filename, 'fixed': 0, 'failed': 0}
+
+        for definition in file.definitions:
+            template = definition.template
+            if template is None or definition.unchanged:
+                continue
+            try:
+                new_template = fix_template(template)
+            except SyntaxError as e:
+                print(f"  ✗ {file.filename}: {definition.name} template does not parse ({e})")
+                stats['failed'] += 1
+                definition.retry = True
+                continue
+            if new_template is not None:
+                definition.set_template(new_template)
+                stats['fixed'] += 1
+
+        if stats['fixed'] and self.dry_run:
+            print(f"~ {file.filename}: Would fix {stats['fixed']} templates")
+        elif stats['fixed']:
+            print(f"✓ {file.filename}: Fixed {stats['fixed']} templates")
+        else:
+            print(f"- {file.filename}: No fixes needed")
+        return stats
+
+    def skipped(self, filepath, recorded):
+        return {'filename': os.path.basename(filepath), 'fixed': 0, 'failed': 0}
+
+    def summarize(self, all_stats):
+        fixed_files = sum(1 for stats in all_stats if stats['fixed'])
+        failed_templates = sum(stats['failed'] for stats in all_stats)
+        verb = "Would fix" if self.dry_run else "Fixed"
+        print(f"{verb} {sum(stats['fixed'] for stats in all_stats)} templates in {fixed_files} files")
+        if failed_templates:
+            print(f"✗ {failed_templates} templates could not be parsed")
 
 def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--dry-run', action='store_true',
+                        help="Print a unified diff of the pending fixes instead of writing files")
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                        help="Number of worker processes (files are fixed independently)")
+    parser.add_argument('--full', action='store_true',
+                        help="Ignore the manifest and re-check every template")
+    args = parser.parse_args()
+
     print("Storage Reference Fix Script")
     print("=" * 60)
 
-    files = []
-    for filename in os.listdir(DEFINITIONS_DIR):
-        if filename.endswith('AllProblems.ts') and filename != 'tutorialAllProblems.ts':
-            files.append(os.path.join(DEFINITIONS_DIR, filename))
-
-    files.sort()
+    files = definition_files(DEFINITIONS_DIR)
 
-    fixed_files = 0
-    for filepath in files:
-        if fix_file(filepath):
-            fixed_files += 1
+    pipeline = Pipeline([StorageFixStage(dry_run=args.dry_run)], DEFINITIONS_DIR, 'fix_storage_references',
+                        dry_run=args.dry_run, full=args.full, jobs=args.jobs, verbose=False)
+    per_file = pipeline.run(files)
 
     print("=" * 60)
-    print(f"Fixed {fixed_files} files")
+    print(f"Checked {pipeline.processed_files} files ({pipeline.unchanged_files} unchanged since last run)")
+    pipeline.summarize(per_file)
 
 if __name__ == '__main__':
     main()
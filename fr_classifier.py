@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Compiled single-pass FR classifier for the rule-based template generator.
+
+Every keyword the generator reacts to is compiled into one overlapping-match,
+trie-factored alternation regex. Scanning the lower-cased FR yields a bitmask
+of all keywords it contains (substring semantics, as the old
+`word in fr_lower` checks had), and from that both the function pattern and
+the storage variables the FR needs, following the priority of OPERATIONS.
+Keyword combinations (e.g. "short" + "url") take precedence over OPERATIONS.
+Keywords in WHOLE_WORDS only match a whole word, not part of a longer one.
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Set, Tuple
+
+# Operation keywords, in priority order: the first operation with any hit wins.
+# Each operation may refine into a variant by a second keyword set; the first
+# matching variant wins, otherwise the operation's default pattern is used.
+OPERATIONS: List[Tuple[str, List[str], List[Tuple[List[str], str]], str]] = [
+    ('create', ['store', 'save', 'create', 'add', 'register', 'upload', 'insert', 'write'],
+     [(['user', 'profile', 'account'], 'create_user'),
+      (['post', 'content', 'message'], 'create_post')],
+     'create_item'),
+    ('read', ['get', 'retrieve', 'fetch', 'read', 'query', 'search', 'find', 'serve', 'return'],
+     [(['feed', 'timeline'], 'get_feed'),
+      (['search'], 'search')],
+     'get_item'),
+    ('update', ['update', 'modify', 'edit', 'change'], [], 'update_item'),
+    ('delete', ['delete', 'remove'], [], 'delete_item'),
+    ('react', ['like', 'vote', 'react', 'upvote', 'downvote'], [], 'add_reaction'),
+    ('follow', ['follow', 'friend', 'subscribe'], [], 'follow_user'),
+    ('cache', ['cache', 'cdn', 'edge'], [], 'cache'),
+    ('analytics', ['analytic', 'track', 'monitor', 'metric', 'count'], [], 'track_event'),
+]
+
+# Patterns recognized by keyword combinations, checked before OPERATIONS: the
+# first combination with a hit in each of its keyword groups wins and adds its
+# storage variable.
+COMBINATIONS: List[Tuple[List[List[str]], str, str]] = [
+    ([['blacklist', 'denylist', 'blocklist']], 'blacklist', 'blacklist'),
+    # Spam alone is as likely about emails, comments or chats as about URLs
+    ([['spam'], ['url', 'link', 'domain']], 'blacklist', 'blacklist'),
+    ([['short', 'shorten', 'shortener'], ['url', 'link']], 'shorten_url', 'urls'),
+]
+
+# Keywords matched as whole words only: "short" must not fire on "shortest"
+# or "shortlist", as combinations outrank every operation
+WHOLE_WORDS: FrozenSet[str] = frozenset({'short', 'shorten', 'shortener'})
+
+# Fallback when no operation keyword is present
+GENERIC_PATTERN = 'generic'
+
+# Storage variable -> keywords that require it (independent of the pattern)
+STORAGE: List[Tuple[str, List[str]]] = [
+    ('users', ['user', 'profile', 'account']),
+    ('posts', ['post', 'content', 'article', 'status']),
+    ('messages', ['message', 'chat', 'comment']),
+    ('reactions', ['like', 'vote', 'react', 'upvote']),
+    ('relationships', ['follow', 'friend', 'subscribe']),
+    ('cache', ['cache', 'cdn']),
+    ('events', ['event', 'analytic', 'track', 'metric']),
+]
+
+
+class FRClass(NamedTuple):
+    """Classification of one FR."""
+    pattern: str
+    storage: FrozenSet[str]
+
+
+def _trie_regex(words: Iterable[str]) -> str:
+    """
+    Alternation of `words` factored into a prefix trie, so the regex engine
+    dispatches on one character per level instead of trying every keyword.
+    Optional suffixes are greedy, so the longest keyword at a position wins.
+    """
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def build(node: dict) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return '(?:' + body + ')?' if '' in node else body
+
+    return build(trie)
+
+
+def _build_tables() -> Tuple['re.Pattern', Dict[str, int], Dict[str, int]]:
+    keywords: Set[str] = set()
+    for _, op_words, variants, _ in OPERATIONS:
+        keywords.update(op_words)
+        for variant_words, _ in variants:
+            keywords.update(variant_words)
+    for _, storage_words in STORAGE:
+        keywords.update(storage_words)
+    for groups, _, _ in COMBINATIONS:
+        for group in groups:
+            keywords.update(group)
+
+    # One bit per keyword
+    bits = {word: 1 << i for i, word in enumerate(sorted(keywords))}
+    keywords -= WHOLE_WORDS
+
+    # The lookahead reports one keyword per start position (the longest).
+    # Any shorter keyword starting at the same position is a substring of it,
+    # so expanding every hit to the bits of all keywords it contains recovers
+    # exactly the substring-membership set the old `in` checks computed.
+    pattern = re.compile('(?=(' + _trie_regex(keywords) + '))')
+    hit_masks = {
+        word: sum(bits[other] for other in keywords if other in word)
+        for word in keywords
+    }
+    return pattern, hit_masks, bits
+
+
+KEYWORD_PATTERN, HIT_MASKS, KEYWORD_BITS = _build_tables()
+
+
+def _mask(words: Iterable[str]) -> int:
+    return sum(KEYWORD_BITS[word] for word in set(words))
+
+
+# The tables above as keyword bitmasks, for cheap membership tests
+_OPERATION_MASKS = [
+    (_mask(op_words), [(_mask(words), variant) for words, variant in variants], default)
+    for _, op_words, variants, default in OPERATIONS
+]
+_STORAGE_MASKS = [(name, _mask(storage_words)) for name, storage_words in STORAGE]
+_COMBINATION_MASKS = [([_mask(group) for group in groups], pattern, storage)
+                      for groups, pattern, storage in COMBINATIONS]
+_WHOLE_WORD_BITS = {word: KEYWORD_BITS[word] for word in WHOLE_WORDS}
+
+
+# Keywords are pure letters, so every occurrence lies inside one run of letters.
+# Masks are memoized per run (FR vocabularies are small), and classifications
+# per mask, which keeps the per-FR cost to one tokenizing scan and lookups.
+LETTER_RUN = re.compile(r'[a-z]+')
+_RUN_MASKS: Dict[str, int] = {}
+_CLASS_BY_MASK: Dict[int, FRClass] = {}
+
+
+def _run_mask(run: str) -> int:
+    mask = _WHOLE_WORD_BITS.get(run, 0)
+    for hit in KEYWORD_PATTERN.findall(run):
+        mask |= HIT_MASKS[hit]
+    _RUN_MASKS[run] = mask
+    return mask
+
+
+def keyword_mask(fr_lower: str) -> int:
+    """Bitmask of all known keywords occurring anywhere in `fr_lower`."""
+    mask = 0
+    for run in LETTER_RUN.findall(fr_lower):
+        run_mask = _RUN_MASKS.get(run)
+        mask |= run_mask if run_mask is not None else _run_mask(run)
+    return mask
+
+
+def keywords_in(fr_lower: str) -> Set[str]:
+    """All known keywords occurring anywhere in `fr_lower`."""
+    mask = keyword_mask(fr_lower)
+    return {word for word, bit in KEYWORD_BITS.items() if mask & bit}
+
+
+def _class_for_mask(mask: int) -> FRClass:
+    pattern = None
+    extra_storage = ()
+    for group_masks, combination_pattern, combination_storage in _COMBINATION_MASKS:
+        if all(mask & group_mask for group_mask in group_masks):
+            pattern = combination_pattern
+            extra_storage = (combination_storage,)
+            break
+
+    if pattern is None:
+        pattern = GENERIC_PATTERN
+        for op_mask, variants, default in _OPERATION_MASKS:
+            if mask & op_mask:
+                pattern = default
+                for variant_mask, variant_pattern in variants:
+                    if mask & variant_mask:
+                        pattern = variant_pattern
+                        break
+                break
+
+    storage = frozenset(
+        [name for name, storage_mask in _STORAGE_MASKS if mask & storage_mask] + list(extra_storage))
+    result = _CLASS_BY_MASK[mask] = FRClass(pattern, storage)
+    return result
+
+
+def _classify(fr: str) -> FRClass:
+    mask = keyword_mask(fr.lower())
+    result = _CLASS_BY_MASK.get(mask)
+    return result if result is not None else _class_for_mask(mask)
+
+
+@lru_cache(maxsize=4096)
+def classify_fr(fr: str) -> FRClass:
+    """Classify an FR into its function pattern and storage needs (memoized)."""
+    return _classify(fr)
@@ -0,0 +1,957 @@
+#!/usr/bin/env python3
+"""
+Optimized variants of the rule-based template patterns.
+
+The naive templates generate_function_from_fr emits are deliberately
+simple: full scans, one dict per record. With --optimized the generator
+swaps in the variants below instead. Each feature is switched on by the
+patterns a problem's FRs classify into, and brings its own imports,
+index storage, private helpers and the functions it replaces. Functions
+of one feature keep its indexes consistent, e.g. the search index is
+updated by create_item/update_item/delete_item of the same template.
+Indexes are underscore-prefixed: the public storage dicts hold the same
+records as in the naive template, and the indexes are derived from them.
+The event store, the follow graph, the reaction counters and the blacklist
+are the exceptions: events live only in compact columns, follows in
+adjacency sets, reactions in per-item maps and blacklist entries in a Bloom
+filter backed by sorted fingerprints.
+
+Function bodies use `__FR__` where the generated docstring names the FR.
+Optimized templates import Set and Tuple from typing alongside the usual names.
+"""
+
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Set
+
+
+class OptimizedFeature(NamedTuple):
+    """Optimized code for a group of patterns that share indexes."""
+    name: str
+    # Patterns any of which switch the feature on
+    triggers: FrozenSet[str]
+    imports: List[str]
+    # Public storage dicts the functions use, declared even if no FR asked for them
+    records: FrozenSet[str]
+    # Index declarations
+    storage: List[str]
+    helpers: str
+    # Pattern -> function code replacing the naive one
+    functions: Dict[str, str]
+
+
+SEARCH_HELPERS = '''TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+def _tokens(record) -> Set[str]:
+    """Lower-cased alphanumeric tokens of a record's values (nested ones included)."""
+    parts = []
+    pending = [record]
+    while pending:
+        value = pending.pop()
+        if isinstance(value, (str, int, float)):
+            parts.append(str(value))
+        elif isinstance(value, dict):
+            pending.extend(value.values())
+        elif isinstance(value, (list, tuple, set)):
+            pending.extend(value)
+        # Timestamps and other objects are not searchable
+    return set(TOKEN_PATTERN.findall(' '.join(parts).lower()))
+
+def _index_item(item_id: str) -> None:
+    tokens = _tokens(items[item_id])
+    _item_tokens[item_id] = tokens
+    for token in tokens:
+        _search_index[token][item_id] = None
+
+def _unindex_item(item_id: str) -> None:
+    for token in _item_tokens.pop(item_id, ()):
+        postings = _search_index[token]
+        postings.pop(item_id, None)
+        if not postings:
+            del _search_index[token]
+
+def _sync_search_index() -> None:
+    """Index items that were stored without going through create_item."""
+    if len(_item_tokens) == len(items):
+        return
+    for item_id in [item_id for item_id in _item_tokens if item_id not in items]:
+        _unindex_item(item_id)
+    for item_id in items:
+        if item_id not in _item_tokens:
+            _index_item(item_id)'''
+
+SEARCH_FUNCTIONS = {
+    'create_item': '''def create_item(item_id: str, **kwargs) -> Dict:
+    """
+    __FR__
+    Optimized implementation - stores the item and indexes its tokens
+    """
+    if item_id in items:
+        _unindex_item(item_id)
+    items[item_id] = {
+        'id': item_id,
+        'created_at': datetime.now(),
+        **kwargs
+    }
+    _index_item(item_id)
+    return items[item_id]''',
+    'update_item': '''def update_item(item_id: str, **kwargs) -> Dict:
+    """
+    __FR__
+    Optimized implementation - updates the item and re-indexes it
+    """
+    if item_id in items:
+        _unindex_item(item_id)
+        items[item_id].update(kwargs)
+        items[item_id]['updated_at'] = datetime.now()
+        _index_item(item_id)
+        return items[item_id]
+    return None''',
+    'delete_item': '''def delete_item(item_id: str) -> bool:
+    """
+    __FR__
+    Optimized implementation - removes the item and its index entries
+    """
+    if item_id in items:
+        _unindex_item(item_id)
+        del items[item_id]
+        return True
+    return False''',
+    'search': '''def search(query: str, limit: int = 20) -> List[Dict]:
+    """
+    __FR__
+    Optimized implementation - inverted index lookup
+    Items must contain every query token. Candidates come from the rarest
+    token's postings and stop at `limit`, so the cost depends on the
+    matches, not on the number of items.
+    """
+    _sync_search_index()
+    query_tokens = set(TOKEN_PATTERN.findall(query.lower()))
+    if not query_tokens:
+        return []
+    postings = sorted((_search_index.get(token, {}) for token in query_tokens), key=len)
+    rarest, others = postings[0], postings[1:]
+    results = []
+    for item_id in rarest:
+        if all(item_id in other for other in others):
+            results.append(items[item_id])
+            if len(results) >= limit:
+                break
+    return results''',
+}
+
+GRAPH_FUNCTIONS = {
+    'follow_user': '''def follow_user(follower_id: str, followee_id: str) -> Dict:
+    """
+    __FR__
+    Optimized implementation - adds the edge to both adjacency sets, O(1)
+    """
+    _following.setdefault(follower_id, set()).add(followee_id)
+    _followers.setdefault(followee_id, set()).add(follower_id)
+    return {
+        'follower_id': follower_id,
+        'followee_id': followee_id
+    }
+
+def unfollow_user(follower_id: str, followee_id: str) -> bool:
+    """
+    __FR__
+    Optimized implementation - removes the edge from both adjacency sets, O(1)
+    """
+    following = _following.get(follower_id)
+    if not following or followee_id not in following:
+        return False
+    following.discard(followee_id)
+    followers = _followers[followee_id]
+    followers.discard(follower_id)
+    # Users without edges leave no empty sets behind
+    if not following:
+        del _following[follower_id]
+    if not followers:
+        del _followers[followee_id]
+    return True
+
+def is_following(follower_id: str, followee_id: str) -> bool:
+    """
+    __FR__
+    Optimized implementation - set membership, O(1)
+    """
+    return followee_id in _following.get(follower_id, ())
+
+def get_followers(user_id: str, limit: Optional[int] = None) -> List[str]:
+    """
+    __FR__
+    Optimized implementation - reads the reverse adjacency set, O(degree)
+    """
+    return list(itertools.islice(_followers.get(user_id, ()), limit))
+
+def get_following(user_id: str, limit: Optional[int] = None) -> List[str]:
+    """
+    __FR__
+    Optimized implementation - reads the forward adjacency set, O(degree)
+    """
+    return list(itertools.islice(_following.get(user_id, ()), limit))
+
+def get_mutual_friends(user1_id: str, user2_id: str) -> List[str]:
+    """
+    __FR__
+    Optimized implementation - users both follow; the intersection iterates the smaller set
+    """
+    return list(_following.get(user1_id, set()) & _following.get(user2_id, set()))
+
+def get_follow_counts(user_id: str) -> Dict[str, int]:
+    """
+    __FR__
+    Optimized implementation - adjacency set sizes, O(1)
+    """
+    return {
+        'followers': len(_followers.get(user_id, ())),
+        'following': len(_following.get(user_id, ()))
+    }''',
+}
+
+FEED_HELPERS = '''def _fan_out_on_read(author_id: str) -> bool:
+    """Whether the author counts as a celebrity when posting; checked per post, as followers change."""
+    return len(_followers.get(author_id, ())) >= CELEBRITY_FOLLOWERS
+
+def _index_post(post_id: str) -> None:
+    """Add a stored post to its author's, the global and (below the threshold) followers' timelines."""
+    entry = (next(_post_sequence), post_id)
+    _post_entries[post_id] = entry
+    author_id = posts[post_id].get('user_id')
+    _user_posts[author_id].append(entry)
+    _recent_posts.append(entry)
+    if _fan_out_on_read(author_id):
+        _celebrities.add(author_id)
+        return
+    for follower_id in _followers.get(author_id, ()):
+        _timelines[follower_id].append(entry)
+
+def _sync_feed_index() -> None:
+    """Index posts that were stored without going through create_post."""
+    if len(_post_entries) == len(posts):
+        return
+    for post_id in [post_id for post_id in _post_entries if post_id not in posts]:
+        del _post_entries[post_id]
+    for post_id in posts:
+        if post_id not in _post_entries:
+            _index_post(post_id)'''
+
+FEED_FUNCTIONS = {
+    'create_post': '''def create_post(post_id: str, user_id: str, content: str, **kwargs) -> Dict:
+    """
+    __FR__
+    Optimized implementation - stores the post and fans it out to followers' timelines
+    """
+    posts[post_id] = {
+        'id': post_id,
+        'user_id': user_id,
+        'content': content,
+        'created_at': datetime.now(),
+        **kwargs
+    }
+    _index_post(post_id)
+    return posts[post_id]''',
+    'get_feed': '''def get_feed(user_id: str, limit: int = 20) -> List[Dict]:
+    """
+    __FR__
+    Optimized implementation - merges precomputed timelines
+    The user's timeline (fanned out on write), their own posts and the posts
+    of celebrities they follow are each newest-last, so a heap merge yields
+    the newest `limit` posts in O(limit log k). Users who follow nobody get
+    the most recent posts overall. Timelines are not backfilled on follow.
+    """
+    _sync_feed_index()
+    following = _following.get(user_id, set())
+    personal = bool(following) or user_id in _user_posts
+    if personal:
+        sources = [_timelines.get(user_id, ()), _user_posts.get(user_id, ())]
+        sources.extend(_user_posts[author_id] for author_id in following & _celebrities
+                       if author_id in _user_posts)
+    else:
+        sources = [_recent_posts]
+
+    feed = []
+    seen = set()
+    for _, post_id in heapq.merge(*(reversed(source) for source in sources), reverse=True):
+        # Deleted posts drop out; a post fanned out before its author became a celebrity comes twice
+        post = posts.get(post_id)
+        if post is None or post_id in seen:
+            continue
+        seen.add(post_id)
+        # Timelines still hold posts of users unfollowed since
+        author_id = post.get('user_id')
+        if personal and author_id != user_id and author_id not in following:
+            continue
+        feed.append(post)
+        if len(feed) >= limit:
+            break
+    return feed''',
+}
+
+CACHE_HELPERS = '''def _purge_expired(now: float) -> None:
+    """Drop entries whose TTL has passed, soonest first; stale heap entries are skipped."""
+    while _expiry_heap and _expiry_heap[0][0] <= now:
+        expires_at, key = heapq.heappop(_expiry_heap)
+        item = cache.get(key)
+        if item is not None and item['expires_at'] == expires_at:
+            del cache[key]
+            del _lru[key]
+            _cache_stats['expirations'] += 1
+
+def _evict_lru() -> None:
+    while len(cache) > CACHE_CAPACITY:
+        key, _ = _lru.popitem(last=False)
+        del cache[key]
+        _cache_stats['evictions'] += 1
+    # Overwritten and evicted keys leave their heap entries behind; rebuild once those dominate
+    if len(_expiry_heap) > 2 * len(cache) + 64:
+        _expiry_heap[:] = [(item['expires_at'], key) for key, item in cache.items()]
+        heapq.heapify(_expiry_heap)
+
+def _sync_cache_index() -> None:
+    """Track entries that were stored without going through cache_item."""
+    if len(_lru) == len(cache):
+        return
+    for key in [key for key in _lru if key not in cache]:
+        del _lru[key]
+    for key, item in cache.items():
+        if key not in _lru:
+            _lru[key] = None
+            heapq.heappush(_expiry_heap, (item['expires_at'], key))'''
+
+CACHE_FUNCTIONS = {
+    'cache': '''def cache_item(key: str, value: any, ttl: int = 3600) -> bool:
+    """
+    __FR__
+    Optimized implementation - bounded LRU cache with TTL
+    Expired entries are purged soonest-first on every call, not only when
+    their key is read again; beyond CACHE_CAPACITY the least recently used
+    entry is evicted. expires_at is on the time.monotonic() clock.
+    """
+    now = time.monotonic()
+    _sync_cache_index()
+    _purge_expired(now)
+    expires_at = now + ttl
+    cache[key] = {
+        'value': value,
+        'expires_at': expires_at
+    }
+    _lru[key] = None
+    _lru.move_to_end(key)
+    heapq.heappush(_expiry_heap, (expires_at, key))
+    _evict_lru()
+    return True
+
+def get_from_cache(key: str) -> any:
+    """
+    __FR__
+    Optimized implementation - O(1) lookup that marks the entry recently used
+    """
+    _sync_cache_index()
+    _purge_expired(time.monotonic())
+    item = cache.get(key)
+    if item is None:
+        _cache_stats['misses'] += 1
+        return None
+    _lru.move_to_end(key)
+    _cache_stats['hits'] += 1
+    return item['value']
+
+def get_cache_stats() -> Dict:
+    """
+    __FR__
+    Hit/miss/eviction counters of the cache
+    """
+    lookups = _cache_stats['hits'] + _cache_stats['misses']
+    return {
+        **_cache_stats,
+        'size': len(cache),
+        'capacity': CACHE_CAPACITY,
+        'hit_rate': _cache_stats['hits'] / lookups if lookups else 0.0
+    }''',
+}
+
+EVENT_HELPERS = '''def _code(name: str, codes: Dict[str, int], names: List[str]) -> int:
+    """Small integer standing for `name` in a column, assigned on first use."""
+    code = codes.get(name)
+    if code is None:
+        code = codes[name] = len(names)
+        names.append(name)
+    return code
+
+def _window_ranges(since: float, until: float) -> List[Tuple[int, int]]:
+    """
+    Column index ranges of the retained events with since <= timestamp < until.
+    Once the ring is full it holds two sorted runs: [oldest:] then [:oldest].
+    """
+    oldest = _event_total % EVENT_CAPACITY if len(_event_times) == EVENT_CAPACITY else 0
+    ranges = []
+    for lo, hi in ((oldest, len(_event_times)), (0, oldest)):
+        start = bisect_left(_event_times, since, lo, hi)
+        end = bisect_left(_event_times, until, start, hi)
+        if start < end:
+            ranges.append((start, end))
+    return ranges'''
+
+EVENT_FUNCTIONS = {
+    'track_event': '''def track_event(event_type: str, item_id: str, metadata: Dict = None) -> Dict:
+    """
+    __FR__
+    Optimized implementation - appends to columnar ring buffer
+    Type, item and timestamp go into typed array columns (2 + 8 + 8 = 18
+    bytes per event on 64-bit Linux instead of a dict); the oldest event is
+    overwritten once EVENT_CAPACITY are stored. Event ids are a sequence number, so they
+    never collide.
+    """
+    global _event_total
+    # Keep timestamps sorted for the window queries even if the wall clock steps back
+    now = time.time()
+    if _event_times:
+        now = max(now, _event_times[(_event_total - 1) % EVENT_CAPACITY])
+    type_code = _code(event_type, _type_codes, _type_names)
+    item_code = _code(item_id, _item_codes, _item_names)
+    event_id = _event_total
+    if len(_event_times) < EVENT_CAPACITY:
+        _event_types.append(type_code)
+        _event_items.append(item_code)
+        _event_times.append(now)
+    else:
+        position = event_id % EVENT_CAPACITY
+        _event_types[position] = type_code
+        _event_items[position] = item_code
+        _event_times[position] = now
+        _event_metadata.pop(event_id - EVENT_CAPACITY, None)
+    if metadata:
+        _event_metadata[event_id] = metadata
+    _event_total += 1
+    _event_counts[(item_id, event_type)] += 1
+    return {
+        'id': event_id,
+        'type': event_type,
+        'item_id': item_id,
+        'metadata': metadata or {},
+        'created_at': datetime.fromtimestamp(now)
+    }
+
+def get_event_counts(item_id: str) -> Dict[str, int]:
+    """
+    __FR__
+    All-time event counts of an item per event type, pre-aggregated on write
+    """
+    return {event_type: _event_counts[(item_id, event_type)]
+            for event_type in _type_names if (item_id, event_type) in _event_counts}
+
+def count_events_in_window(since: float, until: Optional[float] = None, item_id: Optional[str] = None,
+                           event_type: Optional[str] = None) -> int:
+    """
+    __FR__
+    Retained events with since <= timestamp < until (Unix seconds), optionally
+    of one item and/or type. The window is found by binary search; only the
+    filters scan it, over the compact columns.
+    """
+    if until is None:
+        until = float('inf')
+    item_code = _item_codes.get(item_id) if item_id is not None else None
+    type_code = _type_codes.get(event_type) if event_type is not None else None
+    if (item_id is not None and item_code is None) or (event_type is not None and type_code is None):
+        return 0
+    count = 0
+    for start, end in _window_ranges(since, until):
+        if item_code is not None and type_code is not None:
+            count += sum(1 for position in range(start, end)
+                         if _event_items[position] == item_code and _event_types[position] == type_code)
+        elif item_code is not None:
+            count += _event_items[start:end].count(item_code)
+        elif type_code is not None:
+            count += _event_types[start:end].count(type_code)
+        else:
+            count += end - start
+    return count''',
+}
+
+SHORTENER_HELPERS = '''def _base62(number: int) -> str:
+    digits = []
+    while True:
+        number, remainder = divmod(number, 62)
+        digits.append(BASE62_ALPHABET[remainder])
+        if not number:
+            return ''.join(reversed(digits))
+
+# Every code is its block's base62 prefix plus a fixed-width two-character suffix
+_CODE_SUFFIXES = [BASE62_ALPHABET[i // 62] + BASE62_ALPHABET[i % 62] for i in range(62 * 62)]
+
+def _claim_block() -> None:
+    """Hand the calling worker the next unused block of codes (the ticket server)."""
+    with _block_lock:
+        block = next(_next_block)
+    _worker.prefix = _base62(block)
+    _worker.suffixes = iter(_CODE_SUFFIXES)
+
+def _next_code() -> str:
+    """A code no other worker can produce: blocks are never handed out twice."""
+    suffix = next(getattr(_worker, 'suffixes', iter(())), None)
+    if suffix is None:
+        _claim_block()
+        suffix = next(_worker.suffixes)
+    return _worker.prefix + suffix'''
+
+SHORTENER_FUNCTIONS = {
+    'shorten_url': '''def shorten_url(long_url: str) -> Dict:
+    """
+    __FR__
+    Optimized implementation - base62 codes from per-worker counter blocks
+    Each thread draws codes from its own block of 3844, so concurrent calls
+    never collide or contend; a long URL shortened before gets its old code.
+    """
+    code = _short_by_long.get(long_url)
+    if code is not None:
+        return urls[code]
+    code = _next_code()
+    urls[code] = {
+        'code': code,
+        'long_url': long_url,
+        'created_at': datetime.now()
+    }
+    # Another thread may have shortened the same URL meanwhile: keep the first code
+    existing = _short_by_long.setdefault(long_url, code)
+    if existing != code:
+        del urls[code]
+    return urls[existing]
+
+def resolve_url(code: str) -> Optional[str]:
+    """
+    __FR__
+    Optimized implementation - O(1) lookup of the long URL of a short code
+    """
+    record = urls.get(code)
+    return record['long_url'] if record else None''',
+}
+
+REACTION_HELPERS = '''def _count_reaction(item_id: str, reaction_type: str, delta: int) -> None:
+    counts = _reaction_counts.setdefault(item_id, {})
+    counts[reaction_type] = counts.get(reaction_type, 0) + delta
+    if not counts[reaction_type]:
+        del counts[reaction_type]
+
+def _set_total(item_id: str, total: int) -> None:
+    """Record an item's new total; the heap entry of its old total goes stale."""
+    if total:
+        _reaction_totals[item_id] = total
+        heapq.heappush(_top_heap, (-total, item_id))
+    else:
+        _reaction_totals.pop(item_id, None)
+        _reaction_counts.pop(item_id, None)
+        _item_reactors.pop(item_id, None)
+    # Stale entries are dropped by get_top_items; rebuild once they dominate
+    if len(_top_heap) > 2 * len(_reaction_totals) + 64:
+        _top_heap[:] = [(-count, item) for item, count in _reaction_totals.items()]
+        heapq.heapify(_top_heap)'''
+
+REACTION_FUNCTIONS = {
+    'add_reaction': '''def add_reaction(item_id: str, user_id: str, reaction_type: str = 'like') -> Dict:
+    """
+    __FR__
+    Optimized implementation - updates per-item counters, O(log n)
+    A user has one reaction per item: reacting again with the same type
+    changes nothing, with another type moves the user's count over.
+    """
+    reactors = _item_reactors.setdefault(item_id, {})
+    previous = reactors.get(user_id)
+    if previous != reaction_type:
+        reactors[user_id] = reaction_type
+        _count_reaction(item_id, reaction_type, 1)
+        if previous is None:
+            _set_total(item_id, _reaction_totals.get(item_id, 0) + 1)
+        else:
+            _count_reaction(item_id, previous, -1)
+    return {
+        'item_id': item_id,
+        'user_id': user_id,
+        'type': reaction_type
+    }
+
+def remove_reaction(item_id: str, user_id: str) -> bool:
+    """
+    __FR__
+    Optimized implementation - takes back the user's reaction, O(log n)
+    """
+    reactors = _item_reactors.get(item_id)
+    if not reactors or user_id not in reactors:
+        return False
+    _count_reaction(item_id, reactors.pop(user_id), -1)
+    _set_total(item_id, _reaction_totals[item_id] - 1)
+    return True
+
+def get_reaction_counts(item_id: str) -> Dict[str, int]:
+    """
+    __FR__
+    Optimized implementation - reaction counts of an item per type, pre-aggregated
+    """
+    return dict(_reaction_counts.get(item_id, {}))
+
+def get_reaction_count(item_id: str, reaction_type: Optional[str] = None) -> int:
+    """
+    __FR__
+    Optimized implementation - O(1) count of one type, or of all reactions
+    """
+    if reaction_type is None:
+        return _reaction_totals.get(item_id, 0)
+    return _reaction_counts.get(item_id, {}).get(reaction_type, 0)
+
+def get_top_items(k: int = 10) -> List[Tuple[str, int]]:
+    """
+    __FR__
+    Optimized implementation - the k most-reacted items from the max-heap
+    Pops until k current entries are found, dropping stale ones for good,
+    then pushes the current ones back: O(k log n) plus the stale entries.
+    """
+    top = []
+    seen = set()
+    while _top_heap and len(top) < k:
+        negative_total, item_id = heapq.heappop(_top_heap)
+        if item_id not in seen and _reaction_totals.get(item_id) == -negative_total:
+            seen.add(item_id)
+            top.append((item_id, -negative_total))
+    for item_id, total in top:
+        heapq.heappush(_top_heap, (-total, item_id))
+    return top''',
+}
+
+BLACKLIST_HELPERS = '''def _url_key(url: str) -> str:
+    """Lower-cased host and path of a URL or domain: no scheme, credentials, port, query or fragment."""
+    key = url.strip().lower()
+    scheme_end = key.find('://')
+    if scheme_end >= 0:
+        key = key[scheme_end + 3:]
+    key = key.split('#', 1)[0].split('?', 1)[0].rstrip('/')
+    host, _, path = key.partition('/')
+    host = host.rpartition('@')[2].partition(':')[0].rstrip('.')
+    return f'{host}/{path}' if path else host
+
+def _fingerprint(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little')
+
+def _bloom_add(fingerprint: int) -> None:
+    # Double hashing: the k bit positions are h1 + i * h2 for the fingerprint's two halves
+    h1 = fingerprint & 0xFFFFFFFF
+    h2 = (fingerprint >> 32) | 1
+    bits = _bloom_bits
+    size = _bloom_size
+    for i in range(_bloom_hashes):
+        position = (h1 + i * h2) % size
+        bits[position >> 3] |= 1 << (position & 7)
+
+def _bloom_contains(fingerprint: int) -> bool:
+    """False means certainly not blacklisted; O(k), and most misses stop at the first probes."""
+    h1 = fingerprint & 0xFFFFFFFF
+    h2 = (fingerprint >> 32) | 1
+    bits = _bloom_bits
+    size = _bloom_size
+    for i in range(_bloom_hashes):
+        position = (h1 + i * h2) % size
+        if not bits[position >> 3] & (1 << (position & 7)):
+            return False
+    return True
+
+def _size_bloom(capacity: int) -> None:
+    """
+    (Re)build the Bloom filter for `capacity` entries
+    m = -n ln p / (ln 2)^2 bits and k = m / n ln 2 hashes give the false-positive
+    rate p at n entries; the bits are set again from the stored fingerprints.
+    """
+    global _bloom_bits, _bloom_size, _bloom_hashes, _bloom_capacity
+    _bloom_capacity = max(capacity, 1)
+    _bloom_size = max(64, math.ceil(-_bloom_capacity * math.log(BLACKLIST_FALSE_POSITIVE_RATE) / math.log(2) ** 2))
+    _bloom_hashes = max(1, round(_bloom_size / _bloom_capacity * math.log(2)))
+    _bloom_bits = bytearray((_bloom_size + 7) // 8)
+    for fingerprint in itertools.chain(_fingerprints, _pending_fingerprints):
+        _bloom_add(fingerprint)
+
+def _grow_bloom() -> None:
+    """Double the filter's capacity while the entries outgrow it, so the false-positive rate holds."""
+    entries = len(_fingerprints) + len(_pending_fingerprints)
+    if entries > _bloom_capacity:
+        capacity = _bloom_capacity
+        while capacity < entries:
+            capacity *= 2
+        _size_bloom(capacity)
+
+def _merge_pending() -> None:
+    """Merge the pending fingerprints into the sorted array, dropping duplicates, O(n)."""
+    global _fingerprints
+    merged = array('Q')
+    previous = None
+    for fingerprint in heapq.merge(_fingerprints, sorted(_pending_fingerprints)):
+        if fingerprint != previous:
+            merged.append(fingerprint)
+            previous = fingerprint
+    _fingerprints = merged
+    _pending_fingerprints.clear()
+
+def _confirmed(fingerprint: int) -> bool:
+    """Exact membership: the pending set, then a binary search of the sorted array."""
+    if fingerprint in _pending_fingerprints:
+        return True
+    index = bisect_left(_fingerprints, fingerprint)
+    return index < len(_fingerprints) and _fingerprints[index] == fingerprint
+
+_size_bloom(BLACKLIST_CAPACITY)'''
+
+BLACKLIST_FUNCTIONS = {
+    'blacklist': '''def load_blacklist(entries: List[str]) -> int:
+    """
+    __FR__
+    Optimized implementation - bulk-loads domains/URLs, one merge for the whole list
+    Returns the number of distinct entries now blacklisted.
+    """
+    fingerprints = {_fingerprint(_url_key(entry)) for entry in entries}
+    _pending_fingerprints.update(fingerprints)
+    _merge_pending()
+    if len(_fingerprints) > _bloom_capacity:
+        _grow_bloom()
+    else:
+        for fingerprint in fingerprints:
+            _bloom_add(fingerprint)
+    return len(_fingerprints)
+
+def add_to_blacklist(entry: str) -> bool:
+    """
+    __FR__
+    Optimized implementation - adds a domain (with its subdomains) or a URL
+    Returns False if the entry was blacklisted already.
+    """
+    fingerprint = _fingerprint(_url_key(entry))
+    if _bloom_contains(fingerprint) and _confirmed(fingerprint):
+        return False
+    _pending_fingerprints.add(fingerprint)
+    _bloom_add(fingerprint)
+    _grow_bloom()
+    # Merging costs O(n), so let the pending set grow with the array
+    if len(_pending_fingerprints) > max(1024, len(_fingerprints) >> 4):
+        _merge_pending()
+    return True
+
+def is_blacklisted(url: str) -> bool:
+    """
+    __FR__
+    Optimized implementation - Bloom filter first, exact confirmation on a hit
+    Checks the URL's host and path, its host and each parent domain, O(k)
+    Bloom probes each. Only Bloom hits reach the exact fingerprint store, so
+    a clean URL is answered from the bit array alone. Confirmation compares
+    64-bit fingerprints, not strings: a wrong match needs a hash collision.
+    """
+    key = _url_key(url)
+    host = key.partition('/')[0]
+    candidates = [key] if key != host else []
+    labels = host.split('.')
+    # The host and its parent domains, down to the registered domain
+    candidates.extend('.'.join(labels[i:]) for i in range(max(1, len(labels) - 1)))
+    _blacklist_stats['checks'] += 1
+    for candidate in candidates:
+        fingerprint = _fingerprint(candidate)
+        if _bloom_contains(fingerprint):
+            if _confirmed(fingerprint):
+                _blacklist_stats['blocked'] += 1
+                return True
+            _blacklist_stats['false_positives'] += 1
+    return False
+
+def get_blacklist_stats() -> Dict:
+    """
+    __FR__
+    Optimized implementation - filter size, memory use and observed Bloom false positives
+    """
+    entries = len(_fingerprints) + len(_pending_fingerprints)
+    return {
+        'entries': entries,
+        'capacity': _bloom_capacity,
+        'bloom_bits': _bloom_size,
+        'bloom_hashes': _bloom_hashes,
+        'bloom_bytes': len(_bloom_bits),
+        'fingerprint_bytes': _fingerprints.itemsize * len(_fingerprints) + sys.getsizeof(_pending_fingerprints),
+        'expected_false_positive_rate': (1 - math.exp(-_bloom_hashes * entries / _bloom_size)) ** _bloom_hashes,
+        **_blacklist_stats
+    }''',
+}
+
+FEATURES: List[OptimizedFeature] = [
+    OptimizedFeature(
+        name='search',
+        triggers=frozenset({'search'}),
+        imports=['import re', 'from collections import defaultdict'],
+        records=frozenset({'items'}),
+        storage=[
+            '# Inverted index: token -> {item_id: None}, in the order items were (re)indexed',
+            '_search_index = defaultdict(dict)',
+            '# item_id -> tokens it is indexed under',
+            '_item_tokens = {}',
+        ],
+        helpers=SEARCH_HELPERS,
+        functions=SEARCH_FUNCTIONS,
+    ),
+    OptimizedFeature(
+        name='graph',
+        # Feeds read the follow graph, so get_feed switches it on too
+        triggers=frozenset({'follow_user', 'get_feed'}),
+        imports=['import itertools'],
+        # The graph lives in the adjacency sets, not in `relationships` records
+        records=frozenset(),
+        storage=[
+            '# Follow graph: user_id -> ids of the users they follow / who follow them',
+            '_following = {}',
+            '_followers = {}',
+        ],
+        helpers='',
+        functions=GRAPH_FUNCTIONS,
+    ),
+    OptimizedFeature(
+        name='feed',
+        triggers=frozenset({'get_feed'}),
+        imports=['import heapq', 'import itertools', 'from collections import defaultdict, deque'],
+        records=frozenset({'posts'}),
+        storage=[
+            '# Entries kept per timeline',
+            'TIMELINE_LENGTH = 500',
+            '# Authors with at least this many followers are not fanned out on write;',
+            "# their posts are merged into followers' feeds at read time instead.",
+            "# 0 makes every feed fan-out-on-read, float('inf') every feed fan-out-on-write.",
+            'CELEBRITY_FOLLOWERS = 10000',
+            '',
+            '# Bounded timelines of (sequence, post_id), newest last',
+            '_timelines = defaultdict(lambda: deque(maxlen=TIMELINE_LENGTH))',
+            '_user_posts = defaultdict(lambda: deque(maxlen=TIMELINE_LENGTH))',
+            '_recent_posts = deque(maxlen=TIMELINE_LENGTH)',
+            '_post_sequence = itertools.count()',
+            '# post_id -> its timeline entry; authors whose posts are merged at read time',
+            '_post_entries = {}',
+            '_celebrities = set()',
+        ],
+        helpers=FEED_HELPERS,
+        functions=FEED_FUNCTIONS,
+    ),
+    OptimizedFeature(
+        name='cache',
+        triggers=frozenset({'cache'}),
+        imports=['import heapq', 'import time', 'from collections import OrderedDict'],
+        records=frozenset({'cache'}),
+        storage=[
+            '# Entries kept before the least recently used one is evicted',
+            'CACHE_CAPACITY = 10000',
+            '',
+            '# Cache keys, least recently used first',
+            '_lru = OrderedDict()',
+            '# Min-heap of (expires_at, key); entries of overwritten keys are skipped when popped',
+            '_expiry_heap = []',
+            "_cache_stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}",
+        ],
+        helpers=CACHE_HELPERS,
+        functions=CACHE_FUNCTIONS,
+    ),
+    OptimizedFeature(
+        name='events',
+        triggers=frozenset({'track_event'}),
+        imports=['import time', 'from array import array', 'from bisect import bisect_left',
+                 'from collections import defaultdict'],
+        # Events live in the columns below, not in an `events` dict
+        records=frozenset(),
+        storage=[
+            '# Events retained; older ones are overwritten (their counters are kept)',
+            'EVENT_CAPACITY = 1000000',
+            '',
+            '# Event columns: type code, item code, Unix timestamp; a ring buffer once full',
+            "_event_types = array('H')",
+            "_event_items = array('L')",
+            "_event_times = array('d')",
+            '# Events tracked so far: the next event id',
+            '_event_total = 0',
+            '# event id -> metadata, for the retained events that had any',
+            '_event_metadata = {}',
+            '# Column codes of event types and item ids',
+            '_type_codes = {}',
+            '_type_names = []',
+            '_item_codes = {}',
+            '_item_names = []',
+            '# (item_id, event_type) -> all-time count',
+            '_event_counts = defaultdict(int)',
+        ],
+        helpers=EVENT_HELPERS,
+        functions=EVENT_FUNCTIONS,
+    ),
+    OptimizedFeature(
+        name='shortener',
+        triggers=frozenset({'shorten_url'}),
+        imports=['import itertools', 'import string', 'import threading'],
+        records=frozenset({'urls'}),
+        storage=[
+            'BASE62_ALPHABET = string.digits + string.ascii_letters',
+            '',
+            '# Ticket server: block numbers, each standing for 62 * 62 codes',
+            '_next_block = itertools.count()',
+            '_block_lock = threading.Lock()',
+            '# Per-thread code block: its prefix and the suffixes left',
+            '_worker = threading.local()',
+            '# long_url -> code, so a URL shortened twice keeps one code',
+            '_short_by_long = {}',
+        ],
+        helpers=SHORTENER_HELPERS,
+        functions=SHORTENER_FUNCTIONS,
+    ),
+    OptimizedFeature(
+        name='reactions',
+        triggers=frozenset({'add_reaction'}),
+        imports=['import heapq'],
+        # Reactions live in the per-item maps below, not in `reactions` records
+        records=frozenset(),
+        storage=[
+            '# item_id -> {user_id: reaction_type}: one reaction per user and item',
+            '_item_reactors = {}',
+            '# item_id -> {reaction_type: count}, and item_id -> all reactions',
+            '_reaction_counts = {}',
+            '_reaction_totals = {}',
+            '# Max-heap of (-total, item_id); entries whose total changed since are stale',
+            '_top_heap = []',
+        ],
+        helpers=REACTION_HELPERS,
+        functions=REACTION_FUNCTIONS,
+    ),
+    OptimizedFeature(
+        name='blacklist',
+        triggers=frozenset({'blacklist'}),
+        imports=['import hashlib', 'import heapq', 'import itertools', 'import math', 'import sys',
+                 'from array import array', 'from bisect import bisect_left'],
+        # Entries live in the Bloom filter and fingerprint array, not in `blacklist` records
+        records=frozenset(),
+        storage=[
+            '# Entries the Bloom filter is sized for (it doubles beyond that), and its',
+            '# false-positive rate at that size: 1M entries at 0.1% take 1.8 MB of bits',
+            'BLACKLIST_CAPACITY = 1000000',
+            'BLACKLIST_FALSE_POSITIVE_RATE = 0.001',
+            '',
+            '# Bloom filter: bit array, its size in bits, hashes per key, entries it is sized for',
+            '_bloom_bits = bytearray()',
+            '_bloom_size = 0',
+            '_bloom_hashes = 0',
+            '_bloom_capacity = 0',
+            '# Exact store: sorted 64-bit fingerprints of the entries (8 bytes each),',
+            '# and those added since the last merge',
+            "_fingerprints = array('Q')",
+            '_pending_fingerprints = set()',
+            "_blacklist_stats = {'checks': 0, 'blocked': 0, 'false_positives': 0}",
+        ],
+        helpers=BLACKLIST_HELPERS,
+        functions=BLACKLIST_FUNCTIONS,
+    ),
+]
+
+
+def active_features(patterns: Set[str]) -> List[OptimizedFeature]:
+    """The features switched on by a template's patterns, in FEATURES order."""
+    return [feature for feature in FEATURES if feature.triggers & patterns]
+
+
+def optimized_function(pattern: str, fr: str, fr_index: int,
+                       features: List[OptimizedFeature]) -> Optional[str]:
+    """Optimized code for `pattern`, or None if no active feature replaces it."""
+    for feature in reversed(features):
+        if pattern in feature.functions:
+            return feature.functions[pattern].replace('__FR__', f'FR-{fr_index+1}: {fr}')
+    return None
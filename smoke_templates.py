@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+Smoke-execute generated Python templates.
+
+Every template is imported in a sandboxed worker and each of its public
+top-level functions is called once with arguments synthesized from its type hints.
+Workers come from a forkserver pool started once per run, and each worker
+runs a single template: every template gets a fresh fork of a warm,
+preloaded process rather than a new interpreter, with no state left over
+from the previous one.
+Workers run under an address-space limit, and every import and call under
+a wall-clock and CPU-time limit. Results are per function: pass, fail
+(with the exception) or timeout.
+
+    python smoke_templates.py [--jobs N] [--full] [--report PATH|-] [FILE.py ...]
+
+With FILE arguments the given Python files (e.g. test_user_code.py) are
+run instead of the templates in the definitions directory.
+"""
+
+import argparse
+import contextlib
+import inspect
+import io
+import json
+import multiprocessing
+import os
+import resource
+import signal
+import sys
+import time
+import types
+import typing
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+from definition_index import unescape_template
+from template_pipeline import Pipeline, PipelineFile, Stage, definition_files
+
+DEFINITIONS_DIR = "/Users/ankurkothari/Documents/workspace/idlecampus/frontend/src/apps/system-design/builder/challenges/definitions/generated-all"
+
+# Modules the templates import, loaded once in the fork server
+PRELOAD_MODULES = [
+    'collections', 'datetime', 'typing', 'json', 'hashlib', 'heapq', 'bisect',
+    'random', 're', 'time', 'uuid', 'math', 'template_runtime',
+]
+
+DEFAULT_MEMORY_MB = 512
+DEFAULT_CALL_TIMEOUT = 2.0
+# Parent-side deadline per template, for workers killed or stuck outside Python code
+DEFAULT_TEMPLATE_TIMEOUT = 30.0
+
+# Values handed to parameters, by annotation
+SAMPLE_VALUES = {
+    str: 'test', int: 1, float: 1.0, bool: True, bytes: b'test',
+    list: [], dict: {}, set: set(), tuple: (),
+    datetime: datetime(2025, 1, 1),
+}
+
+
+class SandboxTimeout(BaseException):
+    """Raised in a worker when an import or call runs out of time. Not an
+    Exception, so the template's own `except Exception` blocks can't swallow it."""
+
+
+def _raise_timeout(signum, frame):
+    raise SandboxTimeout('cpu' if signum == signal.SIGXCPU else 'wall')
+
+
+def _init_worker(memory_mb: int) -> None:
+    limit = memory_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    signal.signal(signal.SIGALRM, _raise_timeout)
+    signal.signal(signal.SIGXCPU, _raise_timeout)
+
+
+@contextlib.contextmanager
+def _time_limit(seconds: float):
+    """Wall-clock and CPU-time limit for the block (CPU rounded up to whole seconds)."""
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    cpu_used = int(usage.ru_utime + usage.ru_stime)
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu_used + max(1, int(seconds + 0.999)), hard))
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        resource.setrlimit(resource.RLIMIT_CPU, (resource.RLIM_INFINITY, hard))
+
+
+def sample_value(annotation: Any) -> Any:
+    """A value of the annotated type (a string when there is no usable annotation)."""
+    if annotation in SAMPLE_VALUES:
+        value = SAMPLE_VALUES[annotation]
+        # Fresh containers, so calls can't share mutable arguments
+        return type(value)() if isinstance(value, (list, dict, set)) else value
+    origin = typing.get_origin(annotation)
+    if origin is typing.Union:
+        options = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+        return sample_value(options[0]) if options else None
+    if origin is typing.Literal:
+        return typing.get_args(annotation)[0]
+    if origin in SAMPLE_VALUES:
+        return sample_value(origin)
+    return 'test'
+
+
+def synthesize_arguments(function) -> Dict[str, Any]:
+    """Keyword arguments for the parameters of `function` that have no default."""
+    try:
+        hints = typing.get_type_hints(function)
+    except Exception:
+        hints = getattr(function, '__annotations__', {})
+    arguments = {}
+    for parameter in inspect.signature(function).parameters.values():
+        if parameter.default is not parameter.empty:
+            continue
+        if parameter.kind in (parameter.VAR_POSITIONAL, parameter.VAR_KEYWORD):
+            continue
+        if parameter.kind is parameter.POSITIONAL_ONLY:
+            # Not passable by keyword; leave the call to fail visibly
+            continue
+        arguments[parameter.name] = sample_value(hints.get(parameter.name, parameter.empty))
+    return arguments
+
+
+def _outcome(error: BaseException) -> Dict[str, Any]:
+    if isinstance(error, SandboxTimeout):
+        return {'status': 'timeout', 'error': f"{error} time limit"}
+    return {'status': 'fail', 'error': f"{type(error).__name__}: {error}"}
+
+
+def smoke_template(name: str, source: str, call_timeout: float) -> Dict[str, Any]:
+    """
+    Worker side: import `source` as a module, then call each public function
+    it defines. Returns the template's report entry.
+    """
+    entry = {'problem': name, 'status': 'ok', 'functions': []}
+    module = types.ModuleType(f'template_{name}')
+    start = time.perf_counter()
+    # Templates print; their output is not part of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            with _time_limit(call_timeout):
+                exec(compile(source, f'<{name}.pythonTemplate>', 'exec'), module.__dict__)
+        except BaseException as e:
+            entry.update(_outcome(e))
+            entry['status'] = 'import_' + entry['status']
+            entry['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 3)
+            return entry
+
+        # Private helpers (e.g. the index upkeep of optimized variants) assume records
+        # their public callers stored first; they are exercised through those callers
+        functions = [
+            value for name, value in module.__dict__.items()
+            if inspect.isfunction(value) and value.__module__ == module.__name__
+            and not name.startswith('_')
+        ]
+        for function in functions:
+            result = {'function': function.__name__, 'status': 'pass'}
+            try:
+                arguments = synthesize_arguments(function)
+                with _time_limit(call_timeout):
+                    function(**arguments)
+            except BaseException as e:
+                result.update(_outcome(e))
+            entry['functions'].append(result)
+
+    entry['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 3)
+    if any(result['status'] != 'pass' for result in entry['functions']):
+        entry['status'] = 'function_errors'
+    return entry
+
+
+class SandboxPool:
+    """Forkserver worker pool running smoke_template under resource limits."""
+
+    def __init__(self, jobs: int, memory_mb: int = DEFAULT_MEMORY_MB,
+                 call_timeout: float = DEFAULT_CALL_TIMEOUT,
+                 template_timeout: float = DEFAULT_TEMPLATE_TIMEOUT):
+        self.jobs = jobs
+        self.memory_mb = memory_mb
+        self.call_timeout = call_timeout
+        self.template_timeout = template_timeout
+        self.context = multiprocessing.get_context('forkserver')
+        self.context.set_forkserver_preload(PRELOAD_MODULES)
+        self.pool = None
+
+    def __enter__(self):
+        self._start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.pool.terminate()
+        self.pool.join()
+
+    def _start(self) -> None:
+        # One template per worker: module state (template_runtime storage, sys.modules,
+        # signal handlers, memory counted against RLIMIT_AS) never carries over
+        self.pool = self.context.Pool(self.jobs, initializer=_init_worker, initargs=(self.memory_mb,),
+                                      maxtasksperchild=1)
+
+    def run(self, templates: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        """Smoke-test (name, source) pairs concurrently; entries come back in order."""
+        pending = [
+            (name, self.pool.apply_async(smoke_template, (name, source, self.call_timeout)))
+            for name, source in templates
+        ]
+        entries = []
+        stuck = False
+        for name, result in pending:
+            try:
+                entries.append(result.get(self.template_timeout))
+            except multiprocessing.TimeoutError:
+                # The worker died (e.g. killed at the memory limit) or is stuck in C code
+                entries.append({'problem': name, 'status': 'import_timeout', 'functions': [],
+                                'error': f"no result within {self.template_timeout}s"})
+                stuck = True
+        if stuck:
+            # Don't let stuck workers shrink the pool for the rest of the run
+            self.pool.terminate()
+            self.pool.join()
+            self._start()
+        return entries
+
+
+def _file_stats(filename: str, entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    functions = [result for entry in entries for result in entry['functions']]
+    return {
+        'filename': filename,
+        'templates': len(entries),
+        'import_errors': sum(1 for entry in entries if entry['status'].startswith('import_')),
+        'functions': len(functions),
+        'passed': sum(1 for result in functions if result['status'] == 'pass'),
+        'failed': sum(1 for result in functions if result['status'] == 'fail'),
+        'timeouts': sum(1 for result in functions if result['status'] == 'timeout'),
+        'results': entries,
+    }
+
+
+class SmokeTestStage(Stage):
+    """Pipeline stage smoke-executing every template of a file in the sandbox pool."""
+    name = 'smoke'
+    # The worker pool lives in the main process
+    parallel_safe = False
+
+    def __init__(self, jobs: int, **limits):
+        self.jobs = jobs
+        self.limits = limits
+        self.sandbox = None
+
+    def start(self) -> None:
+        self.sandbox = SandboxPool(self.jobs, **self.limits).__enter__()
+
+    def finish(self) -> None:
+        self.sandbox.__exit__(None, None, None)
+
+    def process(self, file: PipelineFile) -> Dict[str, Any]:
+        templates = []
+        for definition in file.definitions:
+            template = definition.template
+            if template is not None:
+                templates.append((definition.name, unescape_template(template)))
+        entries = self.sandbox.run(templates)
+        by_name = {entry['problem']: entry for entry in entries}
+        for definition in file.definitions:
+            entry = by_name.get(definition.name)
+            if entry is not None and entry['status'] != 'ok':
+                # Keep the file out of the manifest until its templates run cleanly
+                definition.retry = True
+
+        stats = _file_stats(file.filename, entries)
+        marker = '✓' if stats['passed'] == stats['functions'] and not stats['import_errors'] else '✗'
+        print(f"{marker} {file.filename}: {stats['passed']}/{stats['functions']} functions passed "
+              f"in {stats['templates']} templates")
+        return stats
+
+    def summarize(self, all_stats: List[Dict[str, Any]]) -> None:
+        totals = {key: sum(stats.get(key, 0) for stats in all_stats)
+                  for key in ('templates', 'import_errors', 'functions', 'passed', 'failed', 'timeouts')}
+        print(f"Templates: {totals['templates']} ({totals['import_errors']} failed to import)")
+        print(f"Functions: {totals['functions']} — {totals['passed']} passed, "
+              f"{totals['failed']} failed, {totals['timeouts']} timed out")
+        for stats in all_stats:
+            for entry in stats.get('results', []):
+                if entry['status'].startswith('import_'):
+                    print(f"  ✗ {stats['filename']}: {entry['problem']} ({entry['error']})")
+                for result in entry['functions']:
+                    if result['status'] != 'pass':
+                        print(f"  ✗ {stats['filename']}: {entry['problem']}.{result['function']} "
+                              f"({result['error']})")
+
+
+def smoke_files(paths: List[str], sandbox: SandboxPool) -> List[Dict[str, Any]]:
+    """Smoke-test standalone Python files; one stats entry per file."""
+    templates = []
+    for path in paths:
+        with open(path, 'r') as f:
+            templates.append((os.path.splitext(os.path.basename(path))[0], f.read()))
+    entries = sandbox.run(templates)
+    return [_file_stats(os.path.basename(path), [entry]) for path, entry in zip(paths, entries)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Smoke-execute Python templates in a sandbox pool',
+                                     formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     epilog=__doc__)
+    parser.add_argument('files', nargs='*', metavar='FILE',
+                        help="Python files to run instead of the definitions' templates")
+    parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1,
+                        help="Number of sandbox workers (default: one per CPU)")
+    parser.add_argument('--full', action='store_true',
+                        help="Ignore the manifest and re-run every file")
+    parser.add_argument('--memory-mb', type=int, default=DEFAULT_MEMORY_MB,
+                        help="Address-space limit per worker")
+    parser.add_argument('--timeout', type=float, default=DEFAULT_CALL_TIMEOUT,
+                        help="Time limit in seconds for each import and function call")
+    parser.add_argument('--report', metavar='PATH',
+                        help="Write a JSON report with per-function results ('-' for stdout)")
+    args = parser.parse_args()
+    limits = {'memory_mb': args.memory_mb, 'call_timeout': args.timeout}
+
+    # The JSON report owns stdout when written there
+    log = sys.stderr if args.report == '-' else sys.stdout
+    with contextlib.redirect_stdout(log):
+        print("Template Smoke Test")
+        print("=" * 60)
+        start = time.perf_counter()
+        stage = SmokeTestStage(args.jobs, **limits)
+        if args.files:
+            with SandboxPool(args.jobs, **limits) as sandbox:
+                per_file = smoke_files(args.files, sandbox)
+            for stats in per_file:
+                print(f"- {stats['filename']}: {stats['passed']}/{stats['functions']} functions passed")
+        else:
+            files = definition_files(DEFINITIONS_DIR)
+            pipeline = Pipeline([stage], DEFINITIONS_DIR, 'smoke_templates', full=args.full, verbose=False)
+            per_file = [file_results[stage.name] for file_results in pipeline.run(files)]
+            print(f"\nFiles: {len(files)} ({pipeline.unchanged_files} unchanged since last run)")
+        print(f"Ran in {time.perf_counter() - start:.2f}s with {args.jobs} workers")
+        stage.summarize(per_file)
+
+    report = {
+        'directory': DEFINITIONS_DIR if not args.files else None,
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'results': [dict(entry, file=stats['filename'])
+                    for stats in per_file for entry in stats.get('results', [])],
+    }
+    if args.report == '-':
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    elif args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'\nReport written to {args.report}', file=log)
+
+    failed = any(stats.get('import_errors') or stats.get('failed') or stats.get('timeouts')
+                 for stats in per_file)
+    print('\n✗ Smoke test failed' if failed else '\n✓ All templates ran', file=log)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
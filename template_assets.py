@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Per-problem pythonTemplate assets.
+
+Embedding every template as a backtick literal makes each *AllProblems.ts
+module carry hundreds of kilobytes of Python that a page only needs for the
+one problem it shows. TemplateAssetStage moves each template to its own file
+
+    python-templates/<group>/<problem>.py
+
+next to the definitions and replaces the property with a lazy loader:
+
+    pythonTemplateLoader: () => import('./python-templates/caching/basicWebCache.py?raw').then((module) => module.default)
+
+The bundler turns every `?raw` import into its own chunk, fetched the first
+time the problem's template is opened. In content-addressed mode the asset
+is a shared blob named by its hash instead (see template_blobs.py).
+"""
+
+import os
+import re
+from typing import Any, Dict, List
+
+from definition_index import unescape_template
+from template_blobs import blob_import_path, blob_report, is_blob_import, print_blob_report
+from template_pipeline import PipelineFile, Stage
+
+ASSET_DIRNAME = 'python-templates'
+ASSET_LAYOUTS = ('per-problem', 'content-addressed')
+
+# The property an inline template is stored under, up to its opening backtick
+TEMPLATE_PROPERTY = re.compile(r'pythonTemplate\s*:\s*`')
+
+
+def asset_import_path(filename: str, problem_name: str) -> str:
+    """Import path, relative to the definitions file, of a problem's template asset."""
+    group = filename[:-len('AllProblems.ts')] if filename.endswith('AllProblems.ts') \
+        else os.path.splitext(filename)[0]
+    stem = problem_name[:-len('ProblemDefinition')] if problem_name.endswith('ProblemDefinition') \
+        else problem_name
+    return f'./{ASSET_DIRNAME}/{group}/{stem}.py?raw'
+
+
+def loader_property(import_path: str) -> str:
+    return f"pythonTemplateLoader: () => import('{import_path}').then((module) => module.default)"
+
+
+class TemplateAssetStage(Stage):
+    """Pipeline stage moving inline pythonTemplate literals out to lazily loaded assets."""
+    name = 'assets'
+
+    def __init__(self, content_addressed: bool = False, directory: str = None):
+        self.content_addressed = content_addressed
+        # Definitions directory, for the dedupe report of content-addressed runs
+        self.directory = directory
+
+    def process(self, file: PipelineFile) -> Dict[str, Any]:
+        stats = {'filename': file.filename, 'externalized': 0, 'bytes_moved': 0}
+
+        # Unchanged definitions are converted too: the layout switch is not a content change
+        for definition in file.definitions:
+            if definition.template_span is None:
+                asset = definition.template_asset
+                if self.content_addressed and asset is not None and not is_blob_import(asset):
+                    # Per-problem asset from an earlier run: move it into the blob store
+                    source = definition.read_asset()
+                    if source is not None:
+                        definition.link_asset(blob_import_path(source), source)
+                        stats['externalized'] += 1
+                continue
+            start, end = definition.template_span
+            key_start = definition.text.rfind('pythonTemplate', 0, start)
+            if key_start == -1 or not TEMPLATE_PROPERTY.fullmatch(definition.text, key_start, start):
+                print(f"  ✗ {definition.name}: pythonTemplate is not a plain property, left inline")
+                continue
+
+            source = unescape_template(definition.template)
+            if self.content_addressed:
+                import_path = blob_import_path(source)
+            else:
+                import_path = asset_import_path(file.filename, definition.name)
+            # `end` is the closing backtick
+            definition.set_text(definition.text[:key_start] + loader_property(import_path)
+                                + definition.text[end + 1:])
+            definition.set_asset(import_path, source)
+            stats['externalized'] += 1
+            stats['bytes_moved'] += end - start
+
+        if stats['externalized']:
+            print(f"✓ {file.filename}: Moved {stats['externalized']} templates to {ASSET_DIRNAME}/")
+        return stats
+
+    def skipped(self, filepath: str, recorded: Dict[str, Any]) -> Dict[str, Any]:
+        return {'filename': os.path.basename(filepath), 'externalized': 0, 'bytes_moved': 0}
+
+    def summarize(self, all_stats: List[Dict[str, Any]]) -> None:
+        externalized = sum(stats['externalized'] for stats in all_stats)
+        if externalized:
+            moved = sum(stats['bytes_moved'] for stats in all_stats)
+            print(f"Templates moved to lazily loaded assets: {externalized} ({moved} bytes)")
+        if self.content_addressed and self.directory is not None:
+            print_blob_report(blob_report(self.directory))
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Content-addressed store for pythonTemplate assets.
+
+Rule-generated templates often come out byte-identical across problems
+(same keyword branches, same helpers). In content-addressed mode each
+template is stored once as
+
+    python-templates/blobs/<sha256 prefix>.py
+
+and every definition with that template imports the same blob, so the
+repository and the bundle carry one copy. Blobs are immutable: changing a
+definition's template links it to a new blob. Each blob is written with
+precompressed `.gz` (and, if the optional `brotli` package is installed,
+`.br`) siblings for servers that serve precompressed static files.
+
+Run this script for the dedupe report of the definitions directory:
+
+    python template_blobs.py [--json] [--prune]
+
+The report also lists per-problem assets (python-templates/<group>/*.py)
+that no definition imports any more, e.g. after a switch to blobs; --prune
+removes them together with unreferenced blobs.
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+from typing import Any, Dict, Set
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from definition_index import index_definitions
+
+DEFINITIONS_DIR = "/Users/ankurkothari/Documents/workspace/idlecampus/frontend/src/apps/system-design/builder/challenges/definitions/generated-all"
+
+BLOB_DIRNAME = 'python-templates/blobs'
+# Per-problem assets live in the other subdirectories of the same root
+ASSET_ROOT = os.path.dirname(BLOB_DIRNAME)
+# 64 bits of SHA-256: no realistic collision among a few thousand templates
+BLOB_HASH_LENGTH = 16
+COMPRESSED_SUFFIXES = ('.gz', '.br')
+
+
+def blob_import_path(source: str) -> str:
+    """Import path, relative to the definitions files, of the blob holding `source`."""
+    digest = hashlib.sha256(source.encode('utf-8')).hexdigest()[:BLOB_HASH_LENGTH]
+    return f'./{BLOB_DIRNAME}/{digest}.py?raw'
+
+
+def is_blob_import(import_path: str) -> bool:
+    return import_path.startswith(f'./{BLOB_DIRNAME}/')
+
+
+def _write_file(path: str, data: bytes) -> None:
+    # Per-process temporary name: parallel workers may write the same blob
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def write_blob(path: str, source: str) -> bool:
+    """
+    Write a blob and its precompressed siblings unless it already exists.
+    Returns True if it was written. The name is the content hash, so an
+    existing blob already holds `source`.
+    """
+    if os.path.exists(path):
+        return False
+    data = source.encode('utf-8')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Siblings first: a blob on disk always has its compressed versions
+    # mtime=0 keeps the .gz byte-identical across runs
+    _write_file(path + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli is not None:
+        _write_file(path + '.br', brotli.compress(data, quality=11))
+    _write_file(path, data)
+    return True
+
+
+def _per_problem_assets(directory: str) -> Set[str]:
+    """Per-problem asset files on disk, relative to the definitions directory."""
+    root = os.path.join(directory, ASSET_ROOT)
+    assets = set()
+    if not os.path.isdir(root):
+        return assets
+    for group in os.listdir(root):
+        group_dir = os.path.join(root, group)
+        if group == os.path.basename(BLOB_DIRNAME) or not os.path.isdir(group_dir):
+            continue
+        assets.update(f'{ASSET_ROOT}/{group}/{name}' for name in os.listdir(group_dir) if name.endswith('.py'))
+    return assets
+
+
+def _size(path: str) -> int:
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def blob_report(directory: str) -> Dict[str, Any]:
+    """
+    Dedupe report for a definitions directory: how many definitions reference
+    blobs, how many distinct blobs they share and the bytes saved, plus the
+    precompressed sizes and any blobs or per-problem assets no definition
+    references any more.
+    """
+    references: Dict[str, int] = {}
+    asset_references: Set[str] = set()
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith('.ts'):
+            continue
+        with open(os.path.join(directory, filename), 'r') as f:
+            content = f.read()
+        for entry in index_definitions(content):
+            if entry.template_asset is None:
+                continue
+            path = entry.template_asset.split('?', 1)[0]
+            if is_blob_import(entry.template_asset):
+                name = os.path.basename(path)
+                references[name] = references.get(name, 0) + 1
+            else:
+                asset_references.add(os.path.normpath(path))
+
+    blob_dir = os.path.join(directory, BLOB_DIRNAME)
+    on_disk = set()
+    if os.path.isdir(blob_dir):
+        on_disk = {name for name in os.listdir(blob_dir) if name.endswith('.py')}
+
+    logical_bytes = stored_bytes = gzip_bytes = brotli_bytes = 0
+    missing = []
+    for name, count in references.items():
+        path = os.path.join(blob_dir, name)
+        if name not in on_disk:
+            missing.append(name)
+            continue
+        size = _size(path)
+        logical_bytes += size * count
+        stored_bytes += size
+        gzip_bytes += _size(path + '.gz')
+        brotli_bytes += _size(path + '.br')
+
+    total_references = sum(references.values())
+    return {
+        'directory': directory,
+        'references': total_references,
+        'unique_blobs': len(references),
+        'dedupe_ratio': round(total_references / len(references), 3) if references else 0.0,
+        'logical_bytes': logical_bytes,
+        'stored_bytes': stored_bytes,
+        'gzip_bytes': gzip_bytes,
+        'brotli_bytes': brotli_bytes if brotli is not None else None,
+        'missing_blobs': sorted(missing),
+        'orphan_blobs': sorted(on_disk - set(references)),
+        'orphan_assets': sorted(path for path in _per_problem_assets(directory)
+                                if os.path.normpath(path) not in asset_references),
+    }
+
+
+def print_blob_report(report: Dict[str, Any]) -> None:
+    print(f"Templates stored as blobs: {report['references']}")
+    print(f"Distinct blobs: {report['unique_blobs']} (dedupe ratio {report['dedupe_ratio']}x)")
+    saved = report['logical_bytes'] - report['stored_bytes']
+    print(f"Bytes: {report['logical_bytes']} referenced, {report['stored_bytes']} stored ({saved} saved)")
+    line = f"Precompressed: {report['gzip_bytes']} gzip"
+    if report['brotli_bytes'] is not None:
+        line += f", {report['brotli_bytes']} brotli"
+    else:
+        line += " (install brotli for .br siblings)"
+    print(line)
+    if report['missing_blobs']:
+        print(f"✗ {len(report['missing_blobs'])} referenced blobs are missing")
+    if report['orphan_blobs']:
+        print(f"~ {len(report['orphan_blobs'])} blobs are no longer referenced (--prune removes them)")
+    if report['orphan_assets']:
+        print(f"~ {len(report['orphan_assets'])} per-problem assets are no longer referenced "
+              f"(--prune removes them)")
+
+
+def prune_orphans(directory: str, report: Dict[str, Any]) -> int:
+    """
+    Delete unreferenced blobs (with their siblings) and per-problem assets,
+    and group directories left empty. Returns how many templates were removed.
+    """
+    blob_dir = os.path.join(directory, BLOB_DIRNAME)
+    for name in report['orphan_blobs']:
+        for suffix in ('',) + COMPRESSED_SUFFIXES:
+            path = os.path.join(blob_dir, name + suffix)
+            if os.path.exists(path):
+                os.remove(path)
+    for relative_path in report['orphan_assets']:
+        path = os.path.join(directory, relative_path)
+        if os.path.exists(path):
+            os.remove(path)
+        group_dir = os.path.dirname(path)
+        if os.path.isdir(group_dir) and not os.listdir(group_dir):
+            os.rmdir(group_dir)
+    return len(report['orphan_blobs']) + len(report['orphan_assets'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Report template blob deduplication',
+                                     formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     epilog=__doc__)
+    parser.add_argument('--json', action='store_true',
+                        help="Print the report as JSON")
+    parser.add_argument('--prune', action='store_true',
+                        help="Delete blobs and per-problem assets that no definition references")
+    args = parser.parse_args()
+
+    report = blob_report(DEFINITIONS_DIR)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print("Template Blob Report")
+        print("=" * 60)
+        print_blob_report(report)
+
+    if args.prune and (report['orphan_blobs'] or report['orphan_assets']):
+        removed = prune_orphans(DEFINITIONS_DIR, report)
+        if not args.json:
+            print(f"✓ Removed {removed} unreferenced templates "
+                  f"({len(report['orphan_blobs'])} blobs, {len(report['orphan_assets'])} per-problem assets)")
+
+
+if __name__ == '__main__':
+    main()
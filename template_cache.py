@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Content-addressed on-disk cache for generated Python templates.
+
+Entries are keyed by a hash of (title, FR list, model, prompt version), so a
+template is reused across runs, branches and machines for as long as its
+inputs are unchanged. Storage is a single SQLite file with size-based LRU
+eviction.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import List, Optional
+
+DEFAULT_CACHE_PATH = os.environ.get(
+    'PYTHON_TEMPLATE_CACHE',
+    os.path.join(os.path.expanduser('~'), '.cache', 'idlecampus', 'python_templates.sqlite3'),
+)
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def template_cache_key(title: str, frs: List[str], model: str, prompt_version: str) -> str:
+    """Stable hash of everything that determines a generated template."""
+    payload = json.dumps([title, list(frs), model, prompt_version], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class TemplateCache:
+    """SQLite-backed template store with LRU eviction by total size."""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.db = sqlite3.connect(path, isolation_level=None)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS templates ('
+            ' key TEXT PRIMARY KEY,'
+            ' code TEXT NOT NULL,'
+            ' size INTEGER NOT NULL,'
+            ' last_used REAL NOT NULL)'
+        )
+        self.db.execute('CREATE INDEX IF NOT EXISTS templates_last_used ON templates (last_used)')
+        self.total_bytes = self.db.execute('SELECT COALESCE(SUM(size), 0) FROM templates').fetchone()[0]
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached template for `key` and mark it recently used."""
+        row = self.db.execute('SELECT code FROM templates WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.db.execute('UPDATE templates SET last_used = ? WHERE key = ?', (time.time(), key))
+        self.hits += 1
+        return row[0]
+
+    def put(self, key: str, code: str) -> None:
+        """Store `code` under `key`, evicting least recently used entries if over budget."""
+        size = len(code.encode('utf-8'))
+        row = self.db.execute('SELECT size FROM templates WHERE key = ?', (key,)).fetchone()
+        if row is not None:
+            self.total_bytes -= row[0]
+        self.db.execute(
+            'INSERT OR REPLACE INTO templates (key, code, size, last_used) VALUES (?, ?, ?, ?)',
+            (key, code, size, time.time()),
+        )
+        self.total_bytes += size
+        self.stores += 1
+        self._evict()
+
+    def _evict(self) -> None:
+        while self.total_bytes > self.max_bytes:
+            row = self.db.execute('SELECT key, size FROM templates ORDER BY last_used LIMIT 1').fetchone()
+            if row is None:
+                break
+            self.db.execute('DELETE FROM templates WHERE key = ?', (row[0],))
+            self.total_bytes -= row[1]
+            self.evictions += 1
+
+    def summary(self) -> str:
+        lookups = self.hits + self.misses
+        hit_rate = 100 * self.hits // lookups if lookups else 0
+        return (f"{self.hits} hits, {self.misses} misses ({hit_rate}% hit rate), "
+                f"{self.stores} stored, {self.evictions} evicted, "
+                f"{self.total_bytes / (1024 * 1024):.1f} MB on disk")
+
+    def close(self) -> None:
+        self.db.close()
@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+"""
+Fused pythonTemplate pipeline: scan -> generate -> fix -> validate -> write.
+
+Each *AllProblems.ts file is read and indexed once. Its definitions then flow
+through a list of pluggable stages in memory, and the file is written at most
+once, after the last stage. add_python_templates_simple.py,
+add_python_templates_generated_all.py, fix_storage_references.py and
+final_validation.py are thin wrappers that run their own stage. Running this
+module chains rule-based generation, storage fixing and validation in a
+single pass over the directory.
+"""
+
+import argparse
+import contextlib
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from definition_index import DefinitionEntry, escape_template, index_definitions, unescape_template
+from definition_manifest import DefinitionManifest, content_hash, definition_hashes
+from edit_journal import EditJournal
+from template_blobs import blob_import_path, is_blob_import, write_blob
+
+DEFINITIONS_DIR = "/Users/ankurkothari/Documents/workspace/idlecampus/frontend/src/apps/system-design/builder/challenges/definitions/generated-all"
+
+
+def definition_files(directory: str, first: Optional[str] = None) -> List[str]:
+    """
+    Every *AllProblems.ts file in `directory` except tutorialAllProblems.ts,
+    sorted, with the file named `first` (if present) moved to the front.
+    """
+    files = sorted(
+        os.path.join(directory, filename) for filename in os.listdir(directory)
+        if filename.endswith('AllProblems.ts') and filename != 'tutorialAllProblems.ts'
+    )
+    if first is not None:
+        first_path = os.path.join(directory, first)
+        if first_path in files:
+            files.remove(first_path)
+            files.insert(0, first_path)
+    return files
+
+
+def asset_file_path(directory: str, import_path: str) -> str:
+    """Filesystem path of a template asset imported as `import_path` from `directory`."""
+    return os.path.normpath(os.path.join(directory, import_path.split('?', 1)[0]))
+
+
+class PipelineDefinition:
+    """
+    One ProblemDefinition as it moves through the stages. Its template is
+    either an inline pythonTemplate literal or a pythonTemplateLoader asset;
+    `template`/`set_template` hide the difference from the stages.
+    """
+
+    def __init__(self, entry: DefinitionEntry, text: str, unchanged: bool = False, directory: str = '.'):
+        self.entry = entry
+        self.name = entry.name
+        self.original_text = text
+        self.text = text
+        # Where asset import paths are resolved from (the definitions file's directory)
+        self.directory = directory
+        # Hash matches the manifest: stages should not redo work on it
+        self.unchanged = unchanged
+        # Set by a stage that could not finish it, so the next run retries it
+        self.retry = False
+        # Python source of the template asset once read, and whether it must be written
+        self.asset_source = None
+        self.asset_dirty = False
+        self._use_index(entry, entry.start)
+
+    def _use_index(self, entry: DefinitionEntry, offset: int) -> None:
+        self.has_template = entry.has_template
+        self.template_asset = entry.template_asset
+        self.template_span = None
+        if entry.template_span is not None:
+            start, end = entry.template_span
+            self.template_span = (start - offset, end - offset)
+
+    @property
+    def changed(self) -> bool:
+        return self.asset_dirty or self.text != self.original_text
+
+    @property
+    def asset_path(self) -> Optional[str]:
+        if self.template_asset is None:
+            return None
+        return asset_file_path(self.directory, self.template_asset)
+
+    def read_asset(self) -> Optional[str]:
+        """Python source of the template asset, or None if it has none or the file is missing."""
+        if self.asset_source is None and self.template_asset is not None:
+            try:
+                with open(self.asset_path, 'r') as f:
+                    self.asset_source = f.read()
+            except FileNotFoundError:
+                return None
+        return self.asset_source
+
+    @property
+    def template(self) -> Optional[str]:
+        """The escaped pythonTemplate body (inline or loaded from its asset), if any."""
+        if self.template_span is not None:
+            start, end = self.template_span
+            return self.text[start:end]
+        source = self.read_asset()
+        return escape_template(source) if source is not None else None
+
+    def hash_text(self) -> str:
+        """What the manifest hashes for this definition: its text plus any asset source."""
+        source = self.read_asset()
+        return self.text if source is None else self.text + '\0' + source
+
+    def set_text(self, text: str) -> None:
+        """Replace the whole definition, e.g. after adding a pythonTemplate."""
+        entries = index_definitions(text)
+        if len(entries) != 1 or entries[0].name != self.name:
+            raise ValueError(f"Rewritten {self.name} no longer indexes as one definition")
+        self.text = text
+        self._use_index(entries[0], 0)
+
+    def set_template(self, body: str) -> None:
+        """Replace the escaped pythonTemplate body, in its literal or its asset."""
+        if self.template_span is not None:
+            start, end = self.template_span
+            self.text = self.text[:start] + body + self.text[end:]
+            self.template_span = (start, start + len(body))
+        elif self.template_asset is not None and is_blob_import(self.template_asset):
+            # Blobs are shared by every definition with the same template: relink instead
+            source = unescape_template(body)
+            self.link_asset(blob_import_path(source), source)
+        elif self.template_asset is not None:
+            self.asset_source = unescape_template(body)
+            self.asset_dirty = True
+        else:
+            raise ValueError(f"{self.name} has no pythonTemplate")
+
+    def set_asset(self, import_path: str, source: str) -> None:
+        """Point the definition's template at a (new) asset holding `source`."""
+        self.template_asset = import_path
+        self.asset_source = source
+        self.asset_dirty = True
+
+    def link_asset(self, import_path: str, source: str) -> None:
+        """Rewrite the loader of an asset-backed definition to import `import_path`."""
+        if import_path != self.template_asset:
+            self.set_text(self.text.replace(self.template_asset, import_path, 1))
+        self.set_asset(import_path, source)
+
+
+class PipelineFile(NamedTuple):
+    """A definitions file handed to each stage."""
+    filepath: str
+    filename: str
+    definitions: List[PipelineDefinition]
+
+
+class Stage:
+    """
+    One step of the pipeline. `process` sees a whole file at a time (so a
+    stage can batch work across its definitions) and returns that file's
+    stats, which are also recorded in the manifest. With --jobs, files are
+    processed in worker processes, so stages must be picklable and keep
+    per-file results in the stats they return rather than on self.
+    """
+    name = 'stage'
+    # False for stages whose resources can't cross process boundaries
+    parallel_safe = True
+
+    def start(self) -> None:
+        """Acquire run-wide resources. Called once, in the main process."""
+
+    def finish(self) -> None:
+        """Release what start() acquired."""
+
+    def process(self, file: PipelineFile) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def skipped(self, filepath: str, recorded: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Stats for a file skipped as unchanged, given what process() returned last time."""
+        return dict(recorded or {}, filename=os.path.basename(filepath))
+
+    def summarize(self, all_stats: List[Dict[str, Any]]) -> None:
+        """Print the run's totals from every file's stats."""
+
+
+def process_file(filepath: str, stages: List[Stage], dry_run: bool = False,
+                 known_definitions: Dict[str, str] = None,
+                 verbose: bool = True) -> Tuple[Dict[str, Dict[str, Any]], Optional[tuple]]:
+    """
+    Read and index `filepath` once, run every stage over its definitions and
+    write the result back at most once. Definitions whose hash matches
+    `known_definitions` (from the manifest) are flagged unchanged.
+    Returns ({stage name: stats}, manifest state); the manifest state is the
+    file's new (content hash, definition hashes, template asset paths), or
+    None on a dry run.
+    """
+    filename = os.path.basename(filepath)
+    if verbose:
+        print(f"\n{'='*60}")
+        print(f"Processing: {filename}")
+        print(f"{'='*60}")
+
+    with open(filepath, 'r') as f:
+        content = f.read()
+
+    entries = index_definitions(content)
+    directory = os.path.dirname(filepath)
+    definitions = [
+        PipelineDefinition(entry, content[entry.start:entry.end], directory=directory)
+        for entry in entries
+    ]
+    # Asset-backed definitions hash their asset too, so editing an asset counts as a change
+    hashes = definition_hashes(content, entries, {
+        definition.name: definition.hash_text()
+        for definition in definitions if definition.template_asset is not None
+    })
+    known_definitions = known_definitions or {}
+    for definition in definitions:
+        definition.unchanged = known_definitions.get(definition.name) == hashes[definition.name]
+    if verbose:
+        print(f"Found {len(definitions)} problem definitions")
+
+    file = PipelineFile(filepath, filename, definitions)
+    results = {}
+    for stage in stages:
+        results[stage.name] = stage.process(file)
+
+    # Every stage's edits land in one journal and one write
+    journal = EditJournal(content)
+    assets = []
+    for definition in definitions:
+        if definition.text != definition.original_text:
+            journal.replace(definition.entry.start, definition.entry.end, definition.text)
+        if definition.asset_dirty:
+            assets.append((definition.template_asset, definition.asset_path, definition.asset_source))
+
+    if (len(journal) or assets) and dry_run:
+        print(journal.diff(filename), end='')
+        for _, path, _ in assets:
+            print(f"~ Would write {os.path.relpath(path, directory)}")
+        print(f"\n~ Dry run: {sum(1 for d in definitions if d.changed)} definitions would change")
+        return results, None
+    elif len(journal) or assets:
+        for import_path, path, source in assets:
+            if is_blob_import(import_path):
+                write_blob(path, source)
+                continue
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as f:
+                f.write(source)
+        new_content = journal.apply()
+        if len(journal):
+            with open(filepath, 'w') as f:
+                f.write(new_content)
+        print(f"\n✓ File updated: {sum(1 for d in definitions if d.changed)} definitions changed"
+              + (f", {len(assets)} template assets written" if assets else ""))
+    else:
+        new_content = content
+        if verbose:
+            print(f"\n- No changes needed")
+
+    if dry_run:
+        return results, None
+
+    # Definitions a stage couldn't finish are left out so they are retried
+    done = [definition for definition in definitions if not definition.retry]
+    asset_paths = [d.asset_path for d in definitions if d.template_asset is not None]
+    return results, (
+        content_hash(new_content) if len(done) == len(definitions) else None,
+        definition_hashes(content, [d.entry for d in done], {d.name: d.hash_text() for d in done}),
+        asset_paths,
+    )
+
+
+def process_file_buffered(filepath: str, stages: List[Stage], dry_run: bool = False,
+                          known_definitions: Dict[str, str] = None, verbose: bool = True):
+    """
+    Run process_file with its log lines captured, so parallel workers
+    don't interleave their output. Returns (results, manifest state, log).
+    """
+    buffer = io.StringIO()
+    with contextlib.redirect_stdout(buffer):
+        results, manifest_state = process_file(filepath, stages, dry_run=dry_run,
+                                               known_definitions=known_definitions, verbose=verbose)
+    return results, manifest_state, buffer.getvalue()
+
+
+class Pipeline:
+    """Runs a list of stages over the definition files of a directory."""
+
+    def __init__(self, stages: List[Stage], directory: str, namespace: str,
+                 dry_run: bool = False, full: bool = False, jobs: int = 1, verbose: bool = True):
+        self.stages = stages
+        self.directory = directory
+        # Manifest namespace; wrappers keep the one their script always used
+        self.namespace = namespace
+        self.dry_run = dry_run
+        self.full = full
+        self.jobs = jobs
+        self.verbose = verbose
+        self.processed_files = 0
+        self.unchanged_files = 0
+
+    def run(self, files: List[str]) -> List[Dict[str, Dict[str, Any]]]:
+        """
+        Process `files` in order and return each file's {stage name: stats}.
+        Files this pipeline already finished with are skipped without being read.
+        """
+        manifest = DefinitionManifest(self.directory, self.namespace, enabled=not self.full)
+        pending = [f for f in files if not manifest.is_unchanged(f)]
+        known = [manifest.known_definitions(f) for f in pending]
+        self.processed_files = len(pending)
+        self.unchanged_files = len(files) - len(pending)
+
+        results = {}
+        for stage in self.stages:
+            stage.start()
+        try:
+            if self.jobs > 1 and all(stage.parallel_safe for stage in self.stages):
+                # Results come back in file order, so the output is deterministic
+                with ProcessPoolExecutor(max_workers=self.jobs) as executor:
+                    outputs = executor.map(
+                        process_file_buffered, pending, [self.stages] * len(pending),
+                        [self.dry_run] * len(pending), known, [self.verbose] * len(pending),
+                    )
+                    for filepath, (file_results, manifest_state, log) in zip(pending, outputs):
+                        print(log, end='')
+                        results[filepath] = (file_results, manifest_state)
+            else:
+                for filepath, known_definitions in zip(pending, known):
+                    results[filepath] = process_file(filepath, self.stages, dry_run=self.dry_run,
+                                                     known_definitions=known_definitions,
+                                                     verbose=self.verbose)
+        finally:
+            for stage in self.stages:
+                stage.finish()
+
+        per_file = []
+        for filepath in files:
+            if filepath in results:
+                file_results, manifest_state = results[filepath]
+                if manifest_state is not None:
+                    sha256, hashes, asset_paths = manifest_state
+                    manifest.record(filepath, sha256, hashes, result=file_results, dependencies=asset_paths)
+            else:
+                recorded = manifest.result(filepath) or {}
+                file_results = {
+                    stage.name: stage.skipped(filepath, recorded.get(stage.name))
+                    for stage in self.stages
+                }
+            per_file.append(file_results)
+
+        if not self.dry_run:
+            manifest.save()
+        return per_file
+
+    def summarize(self, per_file: List[Dict[str, Dict[str, Any]]]) -> None:
+        for stage in self.stages:
+            stage.summarize([file_results[stage.name] for file_results in per_file])
+
+
+def main():
+    # Stages live with the scripts they came from, which import this module
+    from add_python_templates_simple import RuleTemplateStage, write_runtime_module
+    from final_validation import ValidationStage
+    from fix_storage_references import StorageFixStage
+    from template_assets import ASSET_LAYOUTS, TemplateAssetStage
+
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dry-run', action='store_true',
+                        help="Print a unified diff of the pending edits instead of writing files")
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                        help="Number of worker processes (files are processed independently)")
+    parser.add_argument('--full', action='store_true',
+                        help="Ignore the manifest and re-scan every file and definition")
+    parser.add_argument('--shared-runtime', action='store_true',
+                        help="Generate templates that import common helpers from the shared runtime")
+    parser.add_argument('--optimized', action='store_true',
+                        help="Generate the indexed variants of patterns that have one")
+    parser.add_argument('--template-assets', nargs='?', const='per-problem', choices=ASSET_LAYOUTS,
+                        help="Write templates to lazily loaded asset files instead of inlining them: "
+                             "one per problem, or content-addressed blobs shared by identical templates "
+                             "(with --full, also converts already processed files)")
+    args = parser.parse_args()
+    if args.optimized and args.shared_runtime:
+        parser.error("--optimized templates cannot use the naive shared runtime")
+
+    print("Python Template Pipeline (generate -> fix -> validate)")
+    print("=" * 60)
+
+    files = definition_files(DEFINITIONS_DIR, first='cachingAllProblems.ts')
+    print(f"Found {len(files)} files to process")
+
+    if args.shared_runtime and not args.dry_run:
+        runtime_path = write_runtime_module(DEFINITIONS_DIR)
+        print(f"✓ Shared runtime written: {os.path.basename(runtime_path)}")
+
+    stages = [RuleTemplateStage(shared_runtime=args.shared_runtime, optimized=args.optimized),
+              StorageFixStage(dry_run=args.dry_run), ValidationStage()]
+    if args.template_assets:
+        # Last, so templates are moved out only once they are fixed and validated
+        stages.append(TemplateAssetStage(content_addressed=args.template_assets == 'content-addressed',
+                                         directory=DEFINITIONS_DIR))
+
+    pipeline = Pipeline(
+        stages, DEFINITIONS_DIR, 'template_pipeline',
+        dry_run=args.dry_run, full=args.full, jobs=args.jobs,
+    )
+    per_file = pipeline.run(files)
+
+    print("\n" + "=" * 60)
+    print("SUMMARY")
+    print("=" * 60)
+    print(f"\nFiles processed: {pipeline.processed_files} ({pipeline.unchanged_files} unchanged)")
+    pipeline.summarize(per_file)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+"""
+Shared runtime for rule-generated Python templates.
+
+Templates generated with --shared-runtime import the naive storage and helper
+functions below instead of inlining identical copies in every pythonTemplate.
+The helper bodies match what generate_function_from_fr inlines.
+"""
+
+from datetime import datetime
+from typing import List, Dict, Optional, Any
+
+# In-memory storage (naive implementation)
+blacklist = {}
+cache = {}
+data = {}
+events = {}
+items = {}
+messages = {}
+posts = {}
+reactions = {}
+relationships = {}
+urls = {}
+users = {}
+
+def create_user(user_id: str, **kwargs) -> Dict:
+    """
+    Naive implementation - stores user in memory
+    """
+    users[user_id] = {
+        'id': user_id,
+        'created_at': datetime.now(),
+        **kwargs
+    }
+    return users[user_id]
+
+def create_post(post_id: str, user_id: str, content: str, **kwargs) -> Dict:
+    """
+    Naive implementation - stores post in memory
+    """
+    posts[post_id] = {
+        'id': post_id,
+        'user_id': user_id,
+        'content': content,
+        'created_at': datetime.now(),
+        **kwargs
+    }
+    return posts[post_id]
+
+def create_item(item_id: str, **kwargs) -> Dict:
+    """
+    Naive implementation - stores item in memory
+    """
+    items[item_id] = {
+        'id': item_id,
+        'created_at': datetime.now(),
+        **kwargs
+    }
+    return items[item_id]
+
+def get_feed(user_id: str, limit: int = 20) -> List[Dict]:
+    """
+    Naive implementation - returns recent posts
+    """
+    feed_items = sorted(posts.values(), key=lambda x: x['created_at'], reverse=True)
+    return feed_items[:limit]
+
+def search(query: str, limit: int = 20) -> List[Dict]:
+    """
+    Naive implementation - simple string matching
+    """
+    results = []
+    for item in items.values():
+        if query.lower() in str(item).lower():
+            results.append(item)
+    return results[:limit]
+
+def get_item(item_id: str) -> Dict:
+    """
+    Naive implementation - retrieves from memory
+    """
+    return items.get(item_id)
+
+def update_item(item_id: str, **kwargs) -> Dict:
+    """
+    Naive implementation - updates item in memory
+    """
+    if item_id in items:
+        items[item_id].update(kwargs)
+        items[item_id]['updated_at'] = datetime.now()
+        return items[item_id]
+    return None
+
+def delete_item(item_id: str) -> bool:
+    """
+    Naive implementation - removes from memory
+    """
+    if item_id in items:
+        del items[item_id]
+        return True
+    return False
+
+def add_reaction(item_id: str, user_id: str, reaction_type: str = 'like') -> Dict:
+    """
+    Naive implementation - stores reaction in memory
+    """
+    reaction_id = f"{item_id}_{user_id}"
+    reactions[reaction_id] = {
+        'item_id': item_id,
+        'user_id': user_id,
+        'type': reaction_type,
+        'created_at': datetime.now()
+    }
+    return reactions[reaction_id]
+
+def follow_user(follower_id: str, followee_id: str) -> Dict:
+    """
+    Naive implementation - stores relationship in memory
+    """
+    relationship_id = f"{follower_id}_{followee_id}"
+    relationships[relationship_id] = {
+        'follower_id': follower_id,
+        'followee_id': followee_id,
+        'created_at': datetime.now()
+    }
+    return relationships[relationship_id]
+
+def cache_item(key: str, value: any, ttl: int = 3600) -> bool:
+    """
+    Naive implementation - simple in-memory cache with TTL
+    """
+    cache[key] = {
+        'value': value,
+        'expires_at': datetime.now().timestamp() + ttl
+    }
+    return True
+
+def get_from_cache(key: str) -> any:
+    """
+    Naive implementation - retrieves from cache if not expired
+    """
+    if key in cache:
+        item = cache[key]
+        if datetime.now().timestamp() < item['expires_at']:
+            return item['value']
+        del cache[key]
+    return None
+
+def track_event(event_type: str, item_id: str, metadata: Dict = None) -> Dict:
+    """
+    Naive implementation - stores event in memory
+    """
+    event_id = f"{event_type}_{item_id}_{datetime.now().timestamp()}"
+    events[event_id] = {
+        'id': event_id,
+        'type': event_type,
+        'item_id': item_id,
+        'metadata': metadata or {},
+        'created_at': datetime.now()
+    }
+    return events[event_id]
+
+def shorten_url(long_url: str) -> Dict:
+    """
+    Naive implementation - scans for an existing code, else numbers the URL
+    """
+    for record in urls.values():
+        if record['long_url'] == long_url:
+            return record
+    code = format(len(urls) + 1, 'x')
+    urls[code] = {
+        'code': code,
+        'long_url': long_url,
+        'created_at': datetime.now()
+    }
+    return urls[code]
+
+def resolve_url(code: str) -> Optional[str]:
+    """
+    Naive implementation - looks up the long URL of a short code
+    """
+    record = urls.get(code)
+    return record['long_url'] if record else None
+
+def load_blacklist(entries: List[str]) -> int:
+    """
+    Naive implementation - adds the entries one by one
+    """
+    for entry in entries:
+        add_to_blacklist(entry)
+    return len(blacklist)
+
+def add_to_blacklist(entry: str) -> bool:
+    """
+    Naive implementation - stores the domain or URL in memory
+    """
+    blacklist[entry.lower()] = {
+        'entry': entry,
+        'created_at': datetime.now()
+    }
+    return True
+
+def is_blacklisted(url: str) -> bool:
+    """
+    Naive implementation - checks the URL against every entry
+    """
+    url_lower = url.lower()
+    for entry in blacklist:
+        if entry in url_lower:
+            return True
+    return False